@@ -1,25 +1,92 @@
 import os
+import asyncio
+import logging
+import time
 from typing import TypedDict, Annotated, List
 from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage, ToolMessage, AIMessage
-from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver as SqliteSaver
-from tools import get_tools
-from utils import read_resume_file
+from langchain_core.runnables import RunnableConfig
+from langchain_core.callbacks.manager import adispatch_custom_event
+from checkpoints import DurableSqliteSaver
+from tools import build_search, get_tools
+from mailer import build_mail_queue
+from prefetch import ResearchPrefetcher
+from scheduler import LLMScheduler, STANDARD
+from streaming import CACHED_RESPONSE, QUEUED, TOOL_RESULT
+from resume_index import ResumeIndex
+from resume_store import ResumeStore
+from utils import shutdown_parse_executor, warm_parse_executor
+from history import append_messages, count_tokens, trim_history
+from lifecycle import MAX_RESUME_CHARS, MAX_TOOL_OUTPUT_CHARS, cap_text
+from matching import format_match_summary, match_resume
+from llm_cache import CachedModel, ResponseCache
+from metrics import LLM_CACHE_LOOKUPS, LLM_ERRORS, LLM_LATENCY, LLM_TOKENS, TOOL_ERRORS, TOOL_LATENCY, observe, trace
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# What is sent to the model each turn is bounded to roughly this many tokens.
+# The system prompt and the resume/JD context are always kept.
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "12000"))
+HISTORY_KEEP_RECENT = int(os.getenv("HISTORY_KEEP_RECENT", "6"))
+HISTORY_TOOL_OUTPUT_CHARS = int(os.getenv("HISTORY_TOOL_OUTPUT_CHARS", "1500"))
+
+# Per-node deadlines, so a hung model or tool call can't hold a session (and its slot) forever
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "60"))
+
+# Outbound LLM calls share one budget: concurrent calls, tokens per minute (0 = no limit)
+# and a bounded wait queue per priority class
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_MAX_QUEUED = int(os.getenv("LLM_MAX_QUEUED", "100"))
+# Output tokens charged to the budget up front, corrected once the real usage is known
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "500"))
+
+# Alternative draft variants (see variants.py) are sampled at this temperature so that they differ
+VARIANT_TEMPERATURE = float(os.getenv("VARIANT_TEMPERATURE", "0.9"))
+
 class AgentState(TypedDict):
-    messages: Annotated[List[AnyMessage], lambda x, y: x + y]
-    resume_path: str
+    messages: Annotated[List[AnyMessage], append_messages]
+    resume_id: str
+    resume_name: str
     job_description: str
 
+def build_context_message(resume_content: str, job_description: str) -> HumanMessage:
+    """
+    Builds the pinned resume/JD message that follows the system prompt.
+    It is created once per session and stored in the thread, so together with the system
+    prompt it forms a byte-stable prefix that provider-side prompt caching can reuse on every turn.
+    The message ends with a locally computed match summary, so the model starts from the
+    matched skills and gaps instead of working them out from the raw text.
+    """
+    summary = format_match_summary(match_resume(resume_content, job_description))
+    return HumanMessage(content=(
+        f"Here is my resume:\n---RESUME---\n{resume_content}\n\n"
+        f"Here is the job description I want to apply for:\n---JOB DESCRIPTION---\n{job_description}\n\n"
+        f"Here is how my resume matches the job:\n---MATCH SUMMARY---\n{summary}"
+    ))
+
 class Agent:
-    def __init__(self, llm, tools, system_prompt: str, storage):
+    def __init__(self, llm, tools, system_prompt: str, storage, resume_store: ResumeStore = None,
+                 prefetcher: ResearchPrefetcher = None, response_cache: ResponseCache = None,
+                 scheduler: LLMScheduler = None):
         self.system_prompt = system_prompt
         self.llm = llm
         self.tools = tools
+        self.resume_store = resume_store
+        self.storage = storage
+        self.prefetcher = prefetcher
+        self.scheduler = scheduler
+
+        # Everything that is the same on every turn is built once, not per LLM call
+        self.system_message = SystemMessage(content=system_prompt)
+        self.llm_with_tools = llm.bind_tools(tools)
+        self.variant_llm = self.llm_with_tools.bind(temperature=VARIANT_TEMPERATURE)
+        self.tools_by_name = {t.name: t for t in tools}
+        self.cached_model = CachedModel(llm, tools, response_cache) if response_cache is not None else None
         
         graph = StateGraph(AgentState)
         
@@ -48,55 +115,193 @@ class Agent:
             return "tools"
         return "__end__"
 
-    def call_openai(self, state: AgentState):
+    async def call_openai(self, state: AgentState, config: RunnableConfig):
+        started = time.perf_counter()
+        new_messages = []
         messages = state["messages"]
-        
-        # Add system prompt if not present
-        if not isinstance(messages[0], SystemMessage):
-            messages = [SystemMessage(content=self.system_prompt)] + messages
-        
-        # Special handling for the first turn to include resume and JD
-        if len(messages) == 1: # This is the first call
-            resume_content = read_resume_file(state.get("resume_path", ""))
-            job_description = state.get("job_description", "")
-            
-            initial_prompt = (
-                f"Here is my resume:\n---RESUME---\n{resume_content}\n\n"
-                f"Here is the job description I want to apply for:\n---JOB DESCRIPTION---\n{job_description}\n\n"
-                "Please start the process by analyzing these documents and then searching for company information."
+
+        # Sessions started with only resume_id/job_description get their pinned context on the
+        # first turn; it is saved to the thread so later turns reuse exactly the same bytes
+        if not messages:
+            # Parsing the resume is CPU bound, so it runs in the parse process pool
+            resume_content = cap_text(await self.resume_store.atext(state.get("resume_id", "")), MAX_RESUME_CHARS)
+            new_messages.append(build_context_message(resume_content, state.get("job_description", "")))
+            messages = new_messages
+
+        # Static prefix first (system prompt, then resume/JD), then the conversation
+        messages = [self.system_message] + messages
+
+        # Keep the prompt within the token budget: old tool outputs and superseded drafts are compacted
+        full_tokens = count_tokens(messages)
+        messages = trim_history(
+            messages,
+            HISTORY_TOKEN_BUDGET,
+            keep_recent=HISTORY_KEEP_RECENT,
+            tool_output_chars=HISTORY_TOOL_OUTPUT_CHARS,
+        )
+        prepared = time.perf_counter()
+
+        # Alternative draft variants are sampled hotter and never come from the cache
+        variant = config["configurable"].get("variant", 0)
+        model = self.variant_llm if variant else self.llm_with_tools
+
+        # Identical requests (e.g. a resubmitted resume+JD pair) are answered from the response cache,
+        # unless the request asked to bypass it
+        cache_key = None
+        response = None
+        if self.cached_model is not None:
+            if config["configurable"].get("no_cache") or variant:
+                LLM_CACHE_LOOKUPS.labels("bypass").inc()
+            else:
+                cache_key = self.cached_model.key(messages)
+                response = await self.cached_model.get(cache_key)
+
+        if response is not None:
+            # Replayed through the event stream so token clients see the same events as a live answer
+            await adispatch_custom_event(
+                CACHED_RESPONSE, {"content": response.content, "tool_calls": response.tool_calls}, config=config,
+            )
+            logger.info("LLM turn: prep %.1f ms, served from the response cache", (prepared - started) * 1000)
+            trace(
+                config["configurable"].get("thread_id"), "llm_call",
+                prep_ms=round((prepared - started) * 1000, 1), cache_hit=True,
+                tool_calls=[tc["name"] for tc in response.tool_calls],
             )
-            messages.append(HumanMessage(content=initial_prompt))
+            return {"messages": new_messages + [response]}
+
+        if self.scheduler is not None:
+            # Wait for a slot in the global LLM budget; interactive turns are served before bulk ones
+            estimated_tokens = count_tokens(messages) + LLM_EXPECTED_OUTPUT_TOKENS
+
+            async def announce_queued(position):
+                await adispatch_custom_event(QUEUED, {"position": position}, config=config)
 
-        llm_with_tools = self.llm.bind_tools(self.tools)
-        response = llm_with_tools.invoke(messages)
-        return {"messages": [response]}
+            async with self.scheduler.slot(
+                config["configurable"].get("priority", STANDARD), estimated_tokens, on_queued=announce_queued,
+            ):
+                queued = time.perf_counter()
+                with observe(LLM_LATENCY, LLM_ERRORS):
+                    response = await asyncio.wait_for(model.ainvoke(messages), LLM_TIMEOUT_SECONDS)
+        else:
+            queued = prepared
+            with observe(LLM_LATENCY, LLM_ERRORS):
+                response = await asyncio.wait_for(model.ainvoke(messages), LLM_TIMEOUT_SECONDS)
+        finished = time.perf_counter()
+        if cache_key is not None:
+            await self.cached_model.set(cache_key, response)
+
+        usage = getattr(response, "usage_metadata", None) or {}
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        if self.scheduler is not None and usage:
+            self.scheduler.charge(input_tokens + output_tokens - estimated_tokens)
+        LLM_TOKENS.labels("input").inc(input_tokens)
+        LLM_TOKENS.labels("output").inc(output_tokens)
+        LLM_TOKENS.labels("cached").inc(cached_tokens)
+        logger.info(
+            "LLM turn: prep %.1f ms, queued %.0f ms, model %.0f ms, history %d -> %d tokens, %d/%d input tokens cached (%.0f%%)",
+            (prepared - started) * 1000,
+            (queued - prepared) * 1000,
+            (finished - queued) * 1000,
+            full_tokens,
+            count_tokens(messages),
+            cached_tokens,
+            input_tokens,
+            100 * cached_tokens / input_tokens if input_tokens else 0,
+        )
+        trace(
+            config["configurable"].get("thread_id"), "llm_call",
+            prep_ms=round((prepared - started) * 1000, 1),
+            queue_ms=round((queued - prepared) * 1000, 1),
+            model_ms=round((finished - queued) * 1000, 1),
+            input_tokens=input_tokens, output_tokens=output_tokens, cached_tokens=cached_tokens,
+            tool_calls=[tc["name"] for tc in response.tool_calls],
+        )
+
+        return {"messages": new_messages + [response]}
     
-    def call_tool(self, state: AgentState):
+    async def call_tool(self, state: AgentState, config: RunnableConfig):
         tool_calls = state["messages"][-1].tool_calls
-        tool_outputs = []
-
-        for tool_call in tool_calls:
-            tool_name = tool_call["name"]
-            found_tool = next((t for t in self.tools if t.name == tool_name), None)
-            
-            if not found_tool:
-                output = f"Error: Tool '{tool_name}' not found."
-            else:
-                # Add resume_path to send_email arguments if it's not already there
-                if tool_name == 'send_email' and 'resume_path' not in tool_call['args']:
-                    tool_call['args']['resume_path'] = state.get("resume_path")
-                
-                output = found_tool.invoke(tool_call["args"])
 
-            tool_outputs.append(ToolMessage(content=str(output), tool_call_id=tool_call["id"]))
+        # Run every tool call of this turn concurrently; gather keeps the original order
+        tool_outputs = await asyncio.gather(
+            *(self.run_tool(tool_call, state, config) for tool_call in tool_calls)
+        )
+        # The session is marked finished once its email is delivered, see DurableSqliteSaver.record_delivery
+        return {"messages": list(tool_outputs)}
+
+    async def run_tool(self, tool_call: dict, state: AgentState, config: RunnableConfig) -> ToolMessage:
+        """
+        Runs a single tool call without blocking the event loop.
+        Tools with a native async implementation (e.g. Tavily) are awaited directly,
+        plain sync tools (e.g. send_email) are offloaded to a worker thread by `ainvoke`.
+        """
+        tool_name = tool_call["name"]
+        found_tool = self.tools_by_name.get(tool_name)
+
+        if not found_tool:
+            output = f"Error: Tool '{tool_name}' not found."
+        else:
+            args = dict(tool_call["args"])
+            # The resume to attach always comes from the session, never from the model
+            if tool_name == 'send_email':
+                args['resume_id'] = state.get("resume_id")
+                args['resume_name'] = state.get("resume_name")
+                args['session_id'] = config["configurable"].get("thread_id")
+
+            started = time.perf_counter()
+            output = None
+            prefetched = False
+            # The company research started at /start is usually done by now, reuse it
+            if tool_name == 'web_search' and self.prefetcher is not None:
+                try:
+                    output = await asyncio.wait_for(
+                        self.prefetcher.take(config["configurable"].get("thread_id"), str(args.get("query", ""))),
+                        TOOL_TIMEOUT_SECONDS,
+                    )
+                    prefetched = output is not None
+                except asyncio.TimeoutError:
+                    # The same search is still hanging, running it again would only wait a second time
+                    output = f"Error running tool '{tool_name}': no result within {TOOL_TIMEOUT_SECONDS:g}s."
+            reported = False
+            # Calls that were neither prefetched nor timed out waiting for the prefetch run the tool
+            invoked = output is None
+            if invoked:
+                try:
+                    output = await asyncio.wait_for(found_tool.ainvoke(args), TOOL_TIMEOUT_SECONDS)
+                    reported = True
+                except asyncio.TimeoutError:
+                    output = f"Error running tool '{tool_name}': no result within {TOOL_TIMEOUT_SECONDS:g}s."
+                except Exception as e:
+                    output = f"Error running tool '{tool_name}': {e}"
+            elapsed = time.perf_counter() - started
+
+            # Prefetched, timed out and failed calls have no tool end callback, report them to the stream here
+            if not reported:
+                await adispatch_custom_event(
+                    TOOL_RESULT, {"name": tool_name, "input": args, "output": str(output), "started": invoked},
+                    config=config,
+                )
 
-        return {"messages": tool_outputs}
+            TOOL_LATENCY.labels(tool_name).observe(elapsed)
+            failed = str(output).startswith("Error")
+            if failed:
+                TOOL_ERRORS.labels(tool_name).inc()
+            trace(
+                config["configurable"].get("thread_id"), "tool_call",
+                tool=tool_name, duration_ms=round(elapsed * 1000, 1), failed=failed, prefetched=prefetched,
+            )
+
+        # Tool outputs are stored in the thread, so a huge search result is cut down first
+        return ToolMessage(content=cap_text(str(output), MAX_TOOL_OUTPUT_CHARS), tool_call_id=tool_call["id"])
 
 system_prompt = (
     "You are an intelligent AI Job Application Assistant. Your goal is to help a user apply for a job."
     "You will be given a resume and a job description."
     "Here is your workflow:"
     "1.  **Analyze & Research**: First, analyze the provided resume and job description. "
+    "    A match summary with the matched skills, the gaps and the most relevant experience is provided; build on it rather than redoing the matching. "
     "    Then, use the `web_search` tool to research the company to find its mission, recent projects, or news. "
     "    Synthesize all this information."
     "2.  **Draft Email**: Based on your analysis, draft a professional and personalized email to the recruiter. "
@@ -105,17 +310,72 @@ system_prompt = (
     "    If they ask for changes, redraft the email. If they approve, they will provide the recipient's email address. "
     "    When they provide the recipient's email, your ONLY response MUST be: 'I am ready to send this email to [recipient_email] with the resume attached. Shall I proceed?'. Do not say anything else."
     "4.  **Send Email**: Once the user gives the final confirmation (e.g., 'Yes', 'Proceed', 'Send it'), use the `send_email` tool to send the email with the resume attached."
-    "5.  **Final Message**: After successfully sending the email, respond ONLY with 'The email has been successfully sent!'"
+    "5.  **Final Message**: The `send_email` tool only queues the email; it is delivered in the background. After it has been queued, respond ONLY with 'The email has been queued for delivery!'. If the tool returns an error, tell the user what went wrong instead."
     "IMPORTANT: Strictly follow this workflow. Do not deviate. Your responses at the confirmation stages must be exactly as described."
 )
 
-tools = get_tools()
-llm = ChatOpenAI(model="gpt-4o", temperature=0.2, streaming=True)
+class Services:
+    """
+    The singletons shared by all requests of one API worker: the resume store, search and
+    mail queue, the tools, the model client, the checkpointer, the response cache, the LLM
+    scheduler and the compiled agent graph.
+    They are built in the app lifespan, after the worker process has started, so no
+    connection, thread or process pool is ever shared between forked workers.
+    `llm` and `search_backend` default to OpenAI and Tavily and can be swapped, e.g. for fakes.
+    """
+
+    def __init__(self, llm=None, search_backend=None):
+        self.resume_store = ResumeStore(
+            os.getenv("UPLOADS_DIR", "uploads"),
+            max_memory_chars=int(os.getenv("RESUME_CACHE_MAX_CHARS", "5000000")),
+            # Resumes imported with ingest.py; sessions can start from them by resume_id
+            index=ResumeIndex(os.getenv("RESUME_INDEX_PATH", "resume_index.sqlite")),
+        )
+        self.search = build_search(search_backend)
+
+        # Checkpoints persist across restarts and are shared by all workers (SQLite in WAL mode).
+        # Old threads are pruned by the maintenance task started in main.py.
+        self.storage = DurableSqliteSaver(os.getenv("CHECKPOINT_DB_PATH", "checkpoints.sqlite"))
+
+        # Delivery statuses are stored with the session, so any worker can report them
+        self.mail_queue = build_mail_queue(on_status=self.storage.record_delivery)
+        self.tools = get_tools(self.resume_store, self.search, self.mail_queue)
+        # Company research is started as soon as a session begins, in parallel with the first LLM call
+        self.prefetcher = ResearchPrefetcher(self.search, ttl_seconds=float(os.getenv("PREFETCH_TTL_SECONDS", "600")))
+        if llm is None:
+            # The OpenAI client library is the slowest import of the app, so it is only loaded here
+            from langchain_openai import ChatOpenAI
+            # stream_usage makes streamed responses report token usage, including cached prompt tokens
+            llm = ChatOpenAI(model="gpt-4o", temperature=0.2, streaming=True, stream_usage=True)
+        self.llm = llm
+
+        # Exact-match cache of complete model responses; requests can opt out with `no_cache`
+        self.response_cache = None
+        if os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true":
+            self.response_cache = ResponseCache(
+                os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite"),
+                ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400")),
+                max_memory_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500")),
+            )
+
+        self.scheduler = LLMScheduler(LLM_MAX_CONCURRENCY, LLM_TOKENS_PER_MINUTE, LLM_MAX_QUEUED)
 
-db_path = "checkpoints.sqlite"
-if os.path.exists(db_path):
-    os.remove(db_path) # Start with a fresh DB each time for this example
-storage = SqliteSaver.from_conn_string(db_path)
+        self.agent_runnable = Agent(
+            self.llm, self.tools, system_prompt, self.storage, self.resume_store,
+            self.prefetcher, self.response_cache, self.scheduler,
+        ).runnable
 
-agent_runnable = Agent(llm, tools, system_prompt, storage).runnable
+    async def warm_up(self) -> None:
+        """
+        Opens the checkpointer and runs everything a first request would otherwise pay for:
+        a state read through the compiled graph and the resume parser processes.
+        """
+        await self.storage.open()
+        await self.agent_runnable.aget_state({"configurable": {"thread_id": "warm-up"}})
+        await warm_parse_executor()
 
+    async def aclose(self) -> None:
+        # Deliver any queued emails before the worker exits
+        await self.mail_queue.drain()
+        await self.storage.aclose()
+        shutdown_parse_executor()
@@ -0,0 +1,274 @@
+"""
+Offline load benchmark for the API.
+
+Serves the app from `main.create_app` with uvicorn in-process, with the agent
+wired to a scripted fake chat model (configurable latency and token rate), a fake
+`web_search` backend and a local SMTP sink, so no OpenAI, Tavily or Gmail calls are made.
+Each simulated user runs the full flow:
+
+    /start -> /feedback (approve + recipient) -> /feedback (confirm, sends the email)
+
+at increasing concurrency. For every level it reports p50/p95/p99 time to first
+byte and total latency per request type, full-flow latency, throughput and RSS
+per session, and writes everything to a JSON file (tagged with the git commit)
+that can be compared against an earlier run with --compare.
+
+Usage (from the `api` directory):
+    python -m benchmarks.api_load --concurrency 1 10 50 --llm-latency 0.3
+    python -m benchmarks.api_load --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import time
+
+import httpx
+from aiosmtpd.controller import Controller
+
+from benchmarks.harness import free_port, isolate, serve
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class SMTPSink:
+    """
+    aiosmtpd handler that accepts and counts every message.
+    """
+
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak instead of current RSS where /proc is not available (kilobytes on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentiles(values) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def pick(q):
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "mean": sum(values) / len(values)}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def timed_stream(client: httpx.AsyncClient, method: str, url: str, **kwargs):
+    """
+    Sends one request and consumes its SSE stream.
+    Returns (time to first byte, total time, parsed data events).
+    """
+    started = time.perf_counter()
+    first_byte = None
+    body = b""
+    async with client.stream(method, url, **kwargs) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            body += chunk
+    total = time.perf_counter() - started
+
+    events = []
+    for block in body.decode().split("\n\n"):
+        for line in block.splitlines():
+            if line.startswith("data: ") and line[6:] != "[DONE]":
+                events.append(json.loads(line[6:]))
+    return first_byte or total, total, events
+
+
+async def run_flow(client: httpx.AsyncClient, resume_bytes: bytes, index: int, samples: dict) -> None:
+    flow_started = time.perf_counter()
+
+    ttfb, total, events = await timed_stream(
+        client, "POST", "/start",
+        files={"resume": ("resume.pdf", resume_bytes, "application/pdf")},
+        data={"job_description": f"Backend engineer #{index} at Acme. Python, FastAPI, LangGraph.", "stream_mode": "tokens"},
+    )
+    samples["start"].append((ttfb, total))
+    session_id = next(e["session_id"] for e in events if "session_id" in e)
+
+    for step, feedback in (("approve", "The draft is approved."), ("send", "Yes, send the email.")):
+        ttfb, total, _ = await timed_stream(
+            client, "POST", "/feedback",
+            json={"session_id": session_id, "feedback": feedback, "recipient_email": "recruiter@example.com", "stream_mode": "tokens"},
+        )
+        samples[step].append((ttfb, total))
+
+    samples["flow"].append(time.perf_counter() - flow_started)
+    samples["sessions"].append(session_id)
+
+
+async def run_level(client: httpx.AsyncClient, resume_bytes: bytes, concurrency: int, session_ids: list) -> dict:
+    samples = {"start": [], "approve": [], "send": [], "flow": [], "sessions": session_ids}
+    peak_rss = baseline_rss = current_rss_bytes()
+    running = True
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while running:
+            peak_rss = max(peak_rss, current_rss_bytes())
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample_rss())
+    started = time.perf_counter()
+    await asyncio.gather(*(run_flow(client, resume_bytes, i, samples) for i in range(concurrency)))
+    wall = time.perf_counter() - started
+    running = False
+    await sampler
+
+    result = {
+        "concurrency": concurrency,
+        "wall_s": wall,
+        "throughput_flows_per_s": concurrency / wall,
+        "rss_per_session_bytes": max(0, peak_rss - baseline_rss) / concurrency,
+        "flow_s": percentiles(samples["flow"]),
+    }
+    for step in ("start", "approve", "send"):
+        result[step] = {
+            "ttfb_s": percentiles([ttfb for ttfb, _ in samples[step]]),
+            "total_s": percentiles([total for _, total in samples[step]]),
+        }
+    return result
+
+
+def print_level(result: dict) -> None:
+    print(
+        f"{result['concurrency']:>5}"
+        f"{result['start']['ttfb_s']['p50'] * 1000:>9.0f}{result['start']['ttfb_s']['p95'] * 1000:>9.0f}{result['start']['ttfb_s']['p99'] * 1000:>9.0f}"
+        f"{result['start']['total_s']['p50'] * 1000:>10.0f}{result['start']['total_s']['p95'] * 1000:>9.0f}{result['start']['total_s']['p99'] * 1000:>9.0f}"
+        f"{result['flow_s']['p50']:>9.2f}{result['flow_s']['p99']:>9.2f}"
+        f"{result['throughput_flows_per_s']:>10.2f}{result['rss_per_session_bytes'] / 1024:>10.0f}"
+    )
+
+
+def print_comparison(current: dict, baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {level["concurrency"]: level for level in baseline["levels"]}
+    print(f"\nCompared with {baseline['commit']} ({baseline_path}):")
+    print(f"{'conc':>5}{'start ttfb p95':>16}{'flow p99':>12}{'throughput':>12}")
+    for level in current["levels"]:
+        before = previous.get(level["concurrency"])
+        if before is None:
+            continue
+
+        def change(new, old):
+            return f"{(new - old) / old:+.0%}" if old else "n/a"
+
+        print(
+            f"{level['concurrency']:>5}"
+            f"{change(level['start']['ttfb_s']['p95'], before['start']['ttfb_s']['p95']):>16}"
+            f"{change(level['flow_s']['p99'], before['flow_s']['p99']):>12}"
+            f"{change(level['throughput_flows_per_s'], before['throughput_flows_per_s']):>12}"
+        )
+
+
+async def main(args) -> None:
+    sink = SMTPSink()
+    smtp_port = free_port()
+    # Everything the app touches on disk lives in a throwaway directory,
+    # and every external service points at a local stand-in
+    work_dir = isolate("api-load-", {
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": smtp_port,
+        "SMTP_USE_SSL": "false",
+        "SENDER_EMAIL": "benchmark@example.com",
+        "MAIL_BACKOFF_SECONDS": "0.05",
+    })
+    controller = Controller(sink, hostname="127.0.0.1", port=smtp_port)
+    controller.start()
+
+    # Imported only now, so the app picks up the environment set above
+    import main as api
+    from agent_logic import Agent, Services, system_prompt
+    from benchmarks.fakes import FakeChatModel, make_fake_search
+    from benchmarks.resume_parsing import make_pdf
+
+    llm = FakeChatModel(latency=args.llm_latency, tokens_per_second=args.tokens_per_second)
+    services = Services(llm, make_fake_search(args.search_latency))
+    # Like the earlier runs, without the LLM response cache and scheduler
+    services.agent_runnable = Agent(
+        llm, services.tools, system_prompt, services.storage, services.resume_store, services.prefetcher,
+    ).runnable
+
+    resume_path = os.path.join(work_dir, "resume.pdf")
+    make_pdf(resume_path, args.resume_pages)
+    with open(resume_path, "rb") as f:
+        resume_bytes = f.read()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "llm_latency_s": args.llm_latency,
+            "tokens_per_second": args.tokens_per_second,
+            "search_latency_s": args.search_latency,
+            "resume_pages": args.resume_pages,
+        },
+        "levels": [],
+    }
+
+    print(f"{'conc':>5}{'ttfb p50':>9}{'p95':>9}{'p99':>9}{'total p50':>10}{'p95':>9}{'p99':>9}{'flow p50':>9}{'p99':>9}{'flows/s':>10}{'KB/sess':>10}")
+    print(f"{'':>5}{'(/start ms)':>27}{'(/start ms)':>28}{'(s)':>18}")
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with serve(api.create_app(services)) as url, httpx.AsyncClient(base_url=url, timeout=None, limits=limits) as client:
+        session_ids = []
+        for concurrency in args.concurrency:
+            result = await run_level(client, resume_bytes, concurrency, session_ids)
+            report["levels"].append(result)
+            print_level(result)
+
+        # send_email only queues the email; wait for the deliveries and read back their status
+        await services.mail_queue.drain()
+        statuses = {}
+        for session_id in session_ids:
+            for email in (await client.get(f"/sessions/{session_id}/emails")).json()["emails"]:
+                statuses[email["status"]] = statuses.get(email["status"], 0) + 1
+    controller.stop()
+
+    sessions = sum(args.concurrency)
+    report["emails_delivered"] = sink.received
+    report["email_statuses"] = statuses
+    print(f"\nEmails delivered to the local SMTP sink: {sink.received}/{sessions}, reported by the API: {statuses}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"api_load-{report['timestamp'].replace(':', '')}-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        print_comparison(report, args.compare)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--resume-pages", type=int, default=2)
+    parser.add_argument("--output", help="Where to write the JSON results (default: benchmarks/results/)")
+    parser.add_argument("--compare", help="A previous JSON result to compare against")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,139 @@
+"""
+Measures checkpoint write/read latency against the number of threads in the database.
+
+For each thread count the database is filled with that many threads (several
+checkpoints each, with a realistic message payload), then concurrent writers
+and readers are timed against it. All savers use the same connection settings
+(WAL, synchronous=NORMAL, busy timeout):
+
+- durable: DurableSqliteSaver, one connection for reads and writes
+- pooled:  the same saver with reads spread over a pool of extra reader connections
+- plain:   a bare AsyncSqliteSaver, without the thread activity bookkeeping
+
+Usage (from the `api` directory):
+    python -m benchmarks.checkpoint_latency --threads 10 100 1000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from checkpoints import DurableSqliteSaver
+
+CHECKPOINTS_PER_THREAD = 4
+RESUME_TEXT = "Built scalable Python services with FastAPI and LangGraph. " * 60
+
+
+class ReaderPoolSaver(DurableSqliteSaver):
+    """
+    DurableSqliteSaver with `aget_tuple` served by a pool of reader connections.
+    """
+
+    def __init__(self, db_path: str, pool_size: int = 4):
+        super().__init__(db_path)
+        self.pool_size = pool_size
+        self._readers = None
+
+    async def aget_tuple(self, config):
+        if self._readers is None:
+            await self.open()
+            readers = asyncio.Queue()
+            for _ in range(self.pool_size):
+                reader = AsyncSqliteSaver(await self._connect(), serde=self.serde)
+                reader.is_setup = True
+                readers.put_nowait(reader)
+            self._readers = readers
+        reader = await self._readers.get()
+        try:
+            return await reader.aget_tuple(config)
+        finally:
+            self._readers.put_nowait(reader)
+
+    async def aclose(self) -> None:
+        while self._readers is not None and not self._readers.empty():
+            await self._readers.get_nowait().conn.close()
+        await super().aclose()
+
+
+def make_checkpoint(turn: int) -> dict:
+    checkpoint = empty_checkpoint()
+    checkpoint["id"] = str(uuid.uuid1())
+    checkpoint["channel_values"] = {
+        "messages": [HumanMessage(content=RESUME_TEXT)] + [AIMessage(content=f"Draft {i}") for i in range(turn)],
+    }
+    return checkpoint
+
+
+def config_for(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+async def fill(saver, thread_ids) -> None:
+    for thread_id in thread_ids:
+        for turn in range(CHECKPOINTS_PER_THREAD):
+            await saver.aput(config_for(thread_id), make_checkpoint(turn), {}, {})
+
+
+async def timed_ops(op, count: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await op(i)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(i) for i in range(count)))
+    latencies.sort()
+    return statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.95)] * 1000
+
+
+async def bench(name: str, saver, thread_count: int, operations: int, concurrency: int) -> None:
+    thread_ids = [str(uuid.uuid4()) for _ in range(thread_count)]
+    await fill(saver, thread_ids)
+
+    async def write(i):
+        await saver.aput(config_for(thread_ids[i % thread_count]), make_checkpoint(CHECKPOINTS_PER_THREAD), {}, {})
+
+    async def read(i):
+        await saver.aget_tuple(config_for(thread_ids[i % thread_count]))
+
+    async def mixed(i):
+        await (write(i) if i % 4 == 0 else read(i))
+
+    print(f"{name:<10}{thread_count:>8}", end="")
+    for op in (write, read, mixed):
+        p50, p95 = await timed_ops(op, operations, concurrency)
+        print(f"{p50:>10.2f}{p95:>10.2f}", end="")
+    print()
+
+
+async def main(thread_counts, operations: int, concurrency: int) -> None:
+    print(f"{'saver':<10}{'threads':>8}{'write p50':>10}{'p95':>10}{'read p50':>10}{'p95':>10}{'mixed p50':>10}{'p95':>10}  (ms)")
+    for thread_count in thread_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, saver_class in (("durable", DurableSqliteSaver), ("pooled", ReaderPoolSaver)):
+                saver = saver_class(os.path.join(tmp, f"{name}.sqlite"))
+                await bench(name, saver, thread_count, operations, concurrency)
+                await saver.aclose()
+
+            conn = await DurableSqliteSaver(os.path.join(tmp, "plain.sqlite"))._connect()
+            await bench("plain", AsyncSqliteSaver(conn), thread_count, operations, concurrency)
+            await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--operations", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(main(args.threads, args.operations, args.concurrency))
@@ -0,0 +1,57 @@
+"""
+Checks that concurrent agent sessions do not block each other.
+
+Runs one session on its own, then N sessions at the same time, against a fake
+LLM and a fake search tool with added latency. With fully async nodes the N
+sessions should finish in roughly the time of one.
+
+Usage (from the `api` directory):
+    python -m benchmarks.concurrent_sessions --sessions 20 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from agent_logic import Agent, system_prompt
+from benchmarks.fakes import FakeChatModel, make_fake_search
+
+
+async def run_session(runnable) -> None:
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    async for _ in runnable.astream(
+        {"messages": [HumanMessage(content="Here is my resume and the job description.")]},
+        config=config,
+    ):
+        pass
+
+
+async def timed(coro) -> float:
+    started = time.perf_counter()
+    await coro
+    return time.perf_counter() - started
+
+
+async def main(sessions: int, llm_latency: float, search_latency: float) -> None:
+    llm = FakeChatModel(latency=llm_latency)
+    runnable = Agent(llm, [make_fake_search(search_latency)], system_prompt, MemorySaver()).runnable
+
+    single = await timed(run_session(runnable))
+    concurrent = await timed(asyncio.gather(*(run_session(runnable) for _ in range(sessions))))
+
+    print(f"1 session:            {single:.2f}s")
+    print(f"{sessions} concurrent sessions: {concurrent:.2f}s ({concurrent / single:.2f}x a single session)")
+    if concurrent > single * 2:
+        raise SystemExit("Concurrent sessions are blocking each other.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.llm_latency, args.search_latency))
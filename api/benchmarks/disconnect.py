@@ -0,0 +1,223 @@
+"""
+Shows that agent work stops when the SSE client goes away or a deadline passes.
+
+Serves the app from `main.create_app` in-process, with the scripted fake chat model and a
+fake `web_search` that tracks how many searches are running. Each scenario checks
+that the in-flight session gauge and the LLM scheduler return to idle, that no
+model or tool work continues afterwards, and that the thread can be resumed:
+
+- disconnect while the research search is running
+- disconnect while the draft is streaming
+- a request deadline that expires during a hung search
+- a tool deadline that turns a hung search into an error result
+- a client that drops the connection mid-draft and reconnects with `Last-Event-ID`
+- a tool deadline while the company research prefetched at /start hangs
+
+Exits with a non-zero status if any check fails.
+
+Usage (from the `api` directory):
+    python -m benchmarks.disconnect
+"""
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from benchmarks.fakes import FakeChatModel, make_fake_search
+from benchmarks.harness import Checks, isolate, read_events, serve
+
+
+class Activity:
+    """
+    Counts model and search calls that are running, and how many were cancelled.
+    """
+
+    def __init__(self):
+        self.running = {"llm": 0, "search": 0}
+        self.started = {"llm": 0, "search": 0}
+        self.cancelled = {"llm": 0, "search": 0}
+
+    async def track(self, kind: str, work):
+        self.running[kind] += 1
+        self.started[kind] += 1
+        try:
+            return await work
+        except asyncio.CancelledError:
+            self.cancelled[kind] += 1
+            raise
+        finally:
+            self.running[kind] -= 1
+
+
+activity = Activity()
+search_latency = {"seconds": 3.0}
+
+
+class TrackedChatModel(FakeChatModel):
+    async def _astream(self, *args, **kwargs):
+        activity.running["llm"] += 1
+        activity.started["llm"] += 1
+        try:
+            async for chunk in super()._astream(*args, **kwargs):
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            activity.cancelled["llm"] += 1
+            raise
+        finally:
+            activity.running["llm"] -= 1
+
+
+@tool("web_search")
+async def slow_search(query: str) -> str:
+    """A search engine useful for finding information about companies, their mission, and recent news."""
+    return await activity.track("search", asyncio.sleep(search_latency["seconds"], result=f"Results for {query}"))
+
+
+async def main() -> int:
+    work_dir = isolate("disconnect-", {
+        "LLM_CACHE_ENABLED": "false",
+        "DISCONNECT_POLL_SECONDS": "0.1",
+        "RECONNECT_GRACE_SECONDS": "0.5",
+    })
+    import agent_logic
+    import main as api
+    from agent_logic import Agent, Services, system_prompt
+    from benchmarks.resume_parsing import make_pdf
+    from metrics import SESSIONS_IN_FLIGHT
+    from prefetch import ResearchPrefetcher
+    from search_cache import CachedSearch, SearchCache
+    from tools import get_tools
+
+    llm = TrackedChatModel(latency=0.2, tokens_per_second=5)
+    # The agent searches with slow_search below; the fake backend just avoids building a Tavily client
+    services = Services(llm, make_fake_search(0))
+    tools = [slow_search] + get_tools(services.resume_store, services.search, services.mail_queue)[1:]
+    services.agent_runnable = Agent(
+        llm, tools, system_prompt, services.storage, services.resume_store, None, None, services.scheduler,
+    ).runnable
+
+    resume_path = os.path.join(work_dir, "resume.pdf")
+    make_pdf(resume_path, 1)
+    with open(resume_path, "rb") as f:
+        resume_bytes = f.read()
+
+    check = Checks()
+
+    async def check_idle():
+        await asyncio.sleep(1.0)
+        started = dict(activity.started)
+        await asyncio.sleep(1.0)
+        check("no model or search call still running", activity.running == {"llm": 0, "search": 0}, str(activity.running))
+        check("no new work started after the stream ended", activity.started == started)
+        check("in-flight session gauge back to 0", SESSIONS_IN_FLIGHT._value.get() == 0)
+        check("LLM scheduler has no active or queued calls",
+              services.scheduler.stats()["active"] == 0 and services.scheduler.queued() == 0)
+
+    async def check_resumable(client, session_id: str):
+        state = await services.agent_runnable.aget_state({"configurable": {"thread_id": session_id}})
+        last = state.values["messages"][-1]
+        check("no unanswered tool calls left in the thread", not (isinstance(last, AIMessage) and last.tool_calls))
+        async with client.stream("POST", "/feedback", json={
+            "session_id": session_id, "feedback": "Please try again.", "stream_mode": "tokens",
+        }) as response:
+            events = await read_events(response)
+        final = [e for e in events if e["type"] == "final"]
+        check("the session resumes with /feedback", bool(final and final[0]["content"]))
+
+    def start(client):
+        return client.stream(
+            "POST", "/start",
+            files={"resume": ("resume.pdf", resume_bytes, "application/pdf")},
+            data={"job_description": "Backend engineer at Acme. Python, FastAPI.", "stream_mode": "tokens"},
+        )
+
+    async with serve(api.create_app(services)) as url, httpx.AsyncClient(base_url=url, timeout=None) as client:
+        print("Disconnect during the research search:")
+        search_latency["seconds"] = 3.0
+        async with start(client) as response:
+            events = await read_events(response, lambda e: e["type"] == "tool_start")
+        await check_idle()
+        check("search was cancelled", activity.cancelled["search"] >= 1, str(activity.cancelled))
+        await check_resumable(client, events[0]["session_id"])
+
+        print("Disconnect while the draft streams:")
+        search_latency["seconds"] = 0.05
+        cancelled = activity.cancelled["llm"]
+        async with start(client) as response:
+            events = await read_events(response, lambda e: e["type"] == "token")
+        await check_idle()
+        check("model stream was cancelled", activity.cancelled["llm"] > cancelled, str(activity.cancelled))
+        await check_resumable(client, events[0]["session_id"])
+
+        print("Request deadline during a hung search:")
+        search_latency["seconds"] = 30
+        api.REQUEST_TIMEOUT_SECONDS = 1.0
+        async with start(client) as response:
+            events = await read_events(response)
+        api.REQUEST_TIMEOUT_SECONDS = 300
+        errors = [e for e in events if e["type"] == "error"]
+        check("stream ends with a deadline error", bool(errors) and "did not finish" in errors[0]["error"])
+        await check_idle()
+        await check_resumable(client, events[0]["session_id"])
+
+        print("Tool deadline during a hung search:")
+        agent_logic.TOOL_TIMEOUT_SECONDS = 0.5
+        async with start(client) as response:
+            events = await read_events(response)
+        agent_logic.TOOL_TIMEOUT_SECONDS = 60
+        outputs = [e["output"] for e in events if e["type"] == "tool_end"]
+        check("search returns a timeout error to the model", bool(outputs) and "no result within" in outputs[0])
+        check("the run still finishes with a draft", any(e["type"] == "final" and e["content"] for e in events))
+        await check_idle()
+
+        print("Reconnect with Last-Event-ID while the draft streams:")
+        search_latency["seconds"] = 0.05
+        started, cancelled = dict(activity.started), dict(activity.cancelled)
+        seqs = []
+        async with start(client) as response:
+            stream_id = response.headers["x-stream-id"]
+            events = await read_events(response, lambda e: e["type"] == "token", seqs)
+        async with client.stream("GET", f"/stream/{stream_id}", headers={"Last-Event-ID": f"{stream_id}:{seqs[-1]}"}) as response:
+            events += await read_events(response, seqs=seqs)
+        check("event ids continue without gaps or duplicates", seqs == list(range(1, len(seqs) + 1)), f"{len(seqs)} events")
+        check("the reconnected stream delivers the draft", any(e["type"] == "final" and e["content"] for e in events))
+        check("the run was not cancelled or restarted",
+              activity.cancelled == cancelled and activity.started["search"] - started["search"] == 1)
+        async with client.stream("GET", f"/stream/{stream_id}", params={"last_event_id": "0"}) as response:
+            replayed = await read_events(response)
+        check("a finished stream replays from the event log", replayed == events)
+        response = await client.get("/stream/unknown")
+        check("an unknown stream is a 404", response.status_code == 404)
+        await check_idle()
+
+        print("Tool deadline while the prefetched research hangs:")
+        # The research /start prefetches goes through slow_search as well
+        search_latency["seconds"] = 30
+        services.prefetcher = ResearchPrefetcher(CachedSearch(slow_search, SearchCache(os.path.join(work_dir, "prefetch_cache.sqlite"))))
+        services.agent_runnable = Agent(
+            llm, tools, system_prompt, services.storage, services.resume_store, services.prefetcher, None, services.scheduler,
+        ).runnable
+        agent_logic.TOOL_TIMEOUT_SECONDS = 0.5
+        started, began = dict(activity.started), time.perf_counter()
+        async with start(client) as response:
+            events = await read_events(response)
+        elapsed = time.perf_counter() - began
+        agent_logic.TOOL_TIMEOUT_SECONDS = 60
+        outputs = [e["output"] for e in events if e["type"] == "tool_end"]
+        check("waiting for the prefetch returns a timeout error", bool(outputs) and "no result within" in outputs[0])
+        check("the run finishes with a draft long before the search would",
+              any(e["type"] == "final" and e["content"] for e in events) and elapsed < 10, f"{elapsed:.1f}s")
+        check("the hung search is not run a second time", activity.started["search"] - started["search"] == 1)
+        await check_idle()
+        check("the prefetched search was cancelled", services.search.stats()["inflight"] == 0
+              and services.prefetcher.search.stats()["inflight"] == 0)
+
+    return check.summary()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
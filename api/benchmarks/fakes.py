@@ -0,0 +1,103 @@
+import asyncio
+import json
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import tool
+
+from prefetch import guess_company
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Scripted stand-in for ChatOpenAI used by the offline benchmarks.
+    It follows the agent workflow from the system prompt: research with `web_search`,
+    draft (and redraft on feedback), ask for confirmation once a recipient is given,
+    call `send_email` after the confirmation and report success.
+    `latency` is the simulated time to first token in seconds and `tokens_per_second`
+    the rate at which the response is streamed.
+    """
+    latency: float = 0.5
+    tokens_per_second: float = 100.0
+    draft: str = "Dear Hiring Manager,\n\nI am excited to apply for this role.\n\nBest regards"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def bind_tools(self, tools: Any, **kwargs: Any):
+        # The scripted responses already know which tools exist
+        return self
+
+    @staticmethod
+    def _tool_call(name: str, args: dict, call_id: str) -> AIMessage:
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}])
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        last_message = messages[-1]
+        ai_messages = [m for m in messages if isinstance(m, AIMessage)]
+
+        if isinstance(last_message, ToolMessage):
+            called = {tc["id"]: tc["name"] for m in ai_messages for tc in m.tool_calls}
+            if called.get(last_message.tool_call_id) == "send_email":
+                return AIMessage(content="The email has been queued for delivery!")
+            return AIMessage(content=self.draft)
+
+        text = last_message.content if isinstance(last_message, HumanMessage) else ""
+        if "Recipient Email:" in text:
+            recipient = text.split("Recipient Email:", 1)[1].strip()
+            if ai_messages and ai_messages[-1].content.startswith("I am ready to send"):
+                return self._tool_call(
+                    "send_email",
+                    {"recipient_email": recipient, "subject": "Job application", "body": self.draft},
+                    f"call_send_{len(messages)}",
+                )
+            return AIMessage(content=f"I am ready to send this email to {recipient} with the resume attached. Shall I proceed?")
+
+        if not any(isinstance(m, ToolMessage) for m in messages):
+            # Like the real model, search for the company named in the job description
+            company = guess_company(text.split("---JOB DESCRIPTION---", 1)[-1].split("---MATCH SUMMARY---", 1)[0]) or "the company"
+            return self._tool_call("web_search", {"query": f"{company} mission and recent news"}, "call_search")
+        return AIMessage(content=self.draft)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        await asyncio.sleep(self.latency)
+        response = self._respond(messages)
+        if response.tool_calls:
+            chunk = AIMessageChunk(content="", tool_call_chunks=[
+                {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": i}
+                for i, tc in enumerate(response.tool_calls)
+            ])
+            yield ChatGenerationChunk(message=chunk)
+            return
+        for token in response.content.split(" "):
+            await asyncio.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token + " "))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def make_fake_search(latency: float = 0.3):
+    """
+    Returns a `web_search` tool that answers after `latency` seconds without any network access.
+    """
+    @tool("web_search")
+    async def web_search(query: str) -> str:
+        """A search engine useful for finding information about companies, their mission, and recent news."""
+        await asyncio.sleep(latency)
+        return f"Search results for '{query}': The company builds developer tools and recently raised a Series B."
+
+    return web_search
+
@@ -0,0 +1,120 @@
+"""
+Helpers shared by the benchmarks: a throwaway environment for the app, the app served
+in-process (over HTTP with uvicorn, or directly through ASGI), SSE parsing and checks.
+
+Importing this module changes nothing. The app reads its settings when its modules are
+imported, so benchmarks call `isolate` first and import `main`, `agent_logic` and the
+like afterwards.
+"""
+import asyncio
+import json
+import os
+import socket
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+
+def app_env(work_dir: str) -> dict:
+    """
+    Settings that keep everything the app stores on disk inside `work_dir`.
+    """
+    return {
+        "UPLOADS_DIR": os.path.join(work_dir, "uploads"),
+        "RESUME_INDEX_PATH": os.path.join(work_dir, "resume_index.sqlite"),
+        "SEARCH_CACHE_PATH": os.path.join(work_dir, "search_cache.sqlite"),
+        "CHECKPOINT_DB_PATH": os.path.join(work_dir, "checkpoints.sqlite"),
+        "LLM_CACHE_PATH": os.path.join(work_dir, "llm_cache.sqlite"),
+    }
+
+
+def isolate(prefix: str, settings: Optional[dict] = None) -> str:
+    """
+    Creates a temporary directory, points the app's storage at it and applies `settings`
+    on top. Must run before the app modules are imported. Returns the directory.
+    """
+    work_dir = tempfile.mkdtemp(prefix=prefix)
+    os.environ.update(app_env(work_dir))
+    os.environ.update({name: str(value) for name, value in (settings or {}).items()})
+    return work_dir
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@asynccontextmanager
+async def serve(app) -> AsyncIterator[str]:
+    """
+    Serves `app` with uvicorn on a free local port and yields its base URL.
+    """
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=free_port(), log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            # Raises why the server did not start
+            serving.result()
+            raise RuntimeError("The server stopped before it started.")
+        await asyncio.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{server.config.port}"
+    finally:
+        server.should_exit = True
+        await serving
+
+
+@asynccontextmanager
+async def asgi_client(app) -> AsyncIterator:
+    """
+    Runs `app`'s lifespan and yields an httpx client that calls it in-process, without a socket.
+    """
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+        yield client
+
+
+async def read_events(response, stop_when=None, seqs=None) -> list:
+    """
+    Reads SSE events until the stream ends or `stop_when(event)` is true.
+    The sequence numbers of their event ids are appended to `seqs`.
+    """
+    events = []
+    seq = None
+    async for line in response.aiter_lines():
+        if line.startswith("id: "):
+            seq = int(line[4:].rpartition(":")[2])
+        if not line.startswith("data: "):
+            continue
+        if seqs is not None:
+            seqs.append(seq)
+        if line[6:] == "[DONE]":
+            continue
+        event = json.loads(line[6:])
+        events.append(event)
+        if stop_when and stop_when(event):
+            break
+    return events
+
+
+class Checks:
+    """
+    Prints one line per check and remembers the failures; `summary` gives the exit status.
+    """
+
+    def __init__(self):
+        self.failures = []
+
+    def __call__(self, name: str, ok: bool, detail: str = "") -> None:
+        print(f"  [{'ok' if ok else 'FAIL'}] {name}{f' ({detail})' if detail else ''}")
+        if not ok:
+            self.failures.append(name)
+
+    def summary(self) -> int:
+        print("FAILED: " + ", ".join(self.failures) if self.failures else "All checks passed.")
+        return 1 if self.failures else 0
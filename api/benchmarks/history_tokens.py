@@ -0,0 +1,71 @@
+"""
+Reports the prompt size of every LLM turn in a typical session, before and after
+history management.
+
+Simulates a session with a resume, a job description, raw search results and
+several redraft rounds, then prints the approximate tokens the model would
+receive on each turn with the full history and with `trim_history`.
+
+Usage (from the `api` directory):
+    python -m benchmarks.history_tokens --redrafts 6 --budget 12000
+"""
+import argparse
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from history import append_messages, count_tokens, trim_history
+
+RESUME = "Senior Python engineer. Built scalable services with FastAPI, LangGraph and PostgreSQL. " * 120
+JOB_DESCRIPTION = "We are hiring a backend engineer to build LLM-powered products at Acme. " * 30
+SEARCH_RESULTS = str([{"url": f"https://example.com/{i}", "content": "Acme builds developer tools. " * 80} for i in range(3)])
+DRAFT = "Dear Hiring Manager,\n\n" + "I am excited to apply for the backend engineer role at Acme. " * 25
+
+
+def simulate(redrafts: int):
+    """
+    Yields the message list the model receives on each turn of the simulated session.
+    """
+    messages = [
+        SystemMessage(content="You are an intelligent AI Job Application Assistant."),
+        HumanMessage(content=f"Here is my resume:\n{RESUME}\n\nHere is the job description:\n{JOB_DESCRIPTION}"),
+    ]
+    yield "analyze", messages
+
+    search_call = AIMessage(content="", tool_calls=[{"name": "web_search", "args": {"query": "Acme mission"}, "id": "call_0"}])
+    messages = append_messages(messages, [search_call, ToolMessage(content=SEARCH_RESULTS, tool_call_id="call_0")])
+    yield "first draft", messages
+
+    for round_number in range(1, redrafts + 1):
+        messages = append_messages(messages, [
+            AIMessage(content=f"{DRAFT} (version {round_number})"),
+            HumanMessage(content="Please make it shorter and mention my LangGraph experience."),
+        ])
+        yield f"redraft {round_number}", messages
+
+    messages = append_messages(messages, [
+        AIMessage(content=f"{DRAFT} (final version)"),
+        HumanMessage(content="Approved. Recipient Email: recruiter@acme.com"),
+    ])
+    yield "confirm", messages
+
+
+def main(redrafts: int, budget: int, keep_recent: int, tool_output_chars: int) -> None:
+    print(f"{'turn':<14}{'full history':>14}{'sent':>10}{'saved':>8}")
+    total_full = total_sent = 0
+    for turn, messages in simulate(redrafts):
+        full = count_tokens(messages)
+        sent = count_tokens(trim_history(messages, budget, keep_recent=keep_recent, tool_output_chars=tool_output_chars))
+        total_full += full
+        total_sent += sent
+        print(f"{turn:<14}{full:>14}{sent:>10}{1 - sent / full:>8.0%}")
+    print(f"{'total':<14}{total_full:>14}{total_sent:>10}{1 - total_sent / total_full:>8.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redrafts", type=int, default=6)
+    parser.add_argument("--budget", type=int, default=12000)
+    parser.add_argument("--keep-recent", type=int, default=6)
+    parser.add_argument("--tool-output-chars", type=int, default=1500)
+    args = parser.parse_args()
+    main(args.redrafts, args.budget, args.keep_recent, args.tool_output_chars)
@@ -0,0 +1,146 @@
+"""
+Bulk resume ingestion benchmark.
+
+Generates a folder of PDF and DOCX resumes (plus a corrupt file and duplicate copies)
+and ingests it with `ingest.Ingestion`:
+
+- with one parse process and with --workers processes
+- again, unchanged (everything is skipped), and after touching and editing files
+- with a per-file timeout too short for any file, to check that timed-out workers are
+  replaced and every file is still recorded
+
+Then serves `main.create_app` in-process with the scripted fake chat model and starts a
+session from an ingested resume by `resume_id`, checking that it is not parsed again.
+
+Exits with a non-zero status if any check fails.
+
+Usage (from the `api` directory):
+    python -m benchmarks.ingest --resumes 200 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import time
+
+import docx
+from pypdf import PdfWriter
+
+from benchmarks.fakes import FakeChatModel, make_fake_search
+from benchmarks.harness import Checks, asgi_client, isolate, read_events
+from benchmarks.resume_parsing import make_docx, make_pdf
+from ingest import Ingestion, find_resumes
+from resume_index import ResumeIndex
+from resume_store import ResumeStore
+
+
+def make_resumes(directory: str, count: int) -> None:
+    os.makedirs(os.path.join(directory, "docx"))
+    for i in range(count):
+        if i % 4 == 3:
+            path = os.path.join(directory, "docx", f"candidate-{i}.docx")
+            make_docx(path, 1 + i % 3)
+            # Every resume gets its own bytes, so it gets its own resume_id
+            document = docx.Document(path)
+            document.add_paragraph(f"Candidate {i}")
+            document.save(path)
+            continue
+        path = os.path.join(directory, f"candidate-{i}.pdf")
+        make_pdf(path, 1 + i % 3)
+        # Every resume gets its own bytes, so it gets its own resume_id
+        writer = PdfWriter(clone_from=path)
+        writer.add_metadata({"/Title": f"Candidate {i}"})
+        with open(path, "wb") as f:
+            writer.write(f)
+    shutil.copy(os.path.join(directory, "candidate-0.pdf"), os.path.join(directory, "copy-of-0.pdf"))
+    with open(os.path.join(directory, "corrupt.pdf"), "wb") as f:
+        f.write(b"%PDF-1.4 this is not really a PDF")
+
+
+def ingest(work_dir: str, directory: str, name: str, workers: int, timeout: float = 60, paths=None) -> tuple:
+    index = ResumeIndex(os.path.join(work_dir, f"{name}.sqlite"))
+    ingestion = Ingestion(index, ResumeStore(os.path.join(work_dir, f"{name}-uploads")), workers, timeout)
+    started = time.perf_counter()
+    counts = ingestion.run(paths or list(find_resumes(directory)))
+    elapsed = time.perf_counter() - started
+    stats = index.stats()
+    index.close()
+    return counts, stats, elapsed
+
+
+async def start_from_index(directory: str) -> list:
+    import main as api
+    from agent_logic import Services
+
+    services = Services(FakeChatModel(latency=0.05, tokens_per_second=1000), make_fake_search(0))
+    ingestion = Ingestion(services.resume_store.index, services.resume_store, 2, 60)
+    ingestion.run(list(find_resumes(directory))[:5])
+    resume_id = services.resume_store.index.file(os.path.join(directory, "candidate-0.pdf"))[2]
+
+    async with asgi_client(api.create_app(services)) as client:
+        data = {"job_description": "Backend engineer at Acme. Python, FastAPI.", "resume_id": resume_id}
+        async with client.stream("POST", "/start", data=data) as response:
+            events = await read_events(response)
+        unknown = await client.post("/start", data={**data, "resume_id": "0" * 64})
+        neither = await client.post("/start", data={"job_description": "x"})
+        state = await services.agent_runnable.aget_state({"configurable": {"thread_id": events[0]["session_id"]}})
+    parsed_again = os.path.exists(os.path.join(services.resume_store.text_dir, resume_id + ".txt"))
+    return [
+        ("a session starts from an indexed resume_id", any(e.get("content") for e in events), str(events[-1])[:60]),
+        ("its context is the indexed resume text",
+         "Built scalable Python services" in state.values["messages"][0].content, ""),
+        ("it keeps the original file name", state.values["resume_name"] == "candidate-0.pdf", state.values["resume_name"]),
+        ("the indexed resume is not parsed again", not parsed_again, ""),
+        ("an unknown resume_id is a 404", unknown.status_code == 404, str(unknown.status_code)),
+        ("no resume and no resume_id is a 400", neither.status_code == 400, str(neither.status_code)),
+    ]
+
+
+def main(count: int, workers: int) -> int:
+    work_dir = isolate("ingest-", {"LLM_CACHE_ENABLED": "false"})
+    check = Checks()
+
+    directory = os.path.join(work_dir, "resumes")
+    make_resumes(directory, count)
+    files = count + 2
+
+    print(f"Ingesting {files} files:")
+    counts, stats, serial = ingest(work_dir, directory, "serial", 1)
+    print(f"  1 process:    {serial:6.2f}s  {counts}")
+    counts, stats, parallel = ingest(work_dir, directory, "pool", workers)
+    print(f"  {workers} processes:  {parallel:6.2f}s  ({serial / parallel:.1f}x)  {stats}")
+    check("every distinct resume is indexed", stats["resumes"] == count, str(stats))
+    check("the corrupt file is recorded as failed", stats["failed"] == 1)
+    check("the copy is recognised as a duplicate", counts["duplicate"] == 1, str(counts))
+
+    print("Re-runs:")
+    counts, _, rerun = ingest(work_dir, directory, "pool", workers)
+    print(f"  unchanged:    {rerun:6.2f}s  {counts}")
+    check("unchanged files are skipped", counts["unchanged"] == files, str(counts))
+    os.utime(os.path.join(directory, "candidate-1.pdf"))
+    make_pdf(os.path.join(directory, "candidate-2.pdf"), 4)
+    counts, _, _ = ingest(work_dir, directory, "pool", workers)
+    check("a touched file is not parsed again", counts["duplicate"] == 1, str(counts))
+    check("an edited file is parsed again", counts["parsed"] == 1, str(counts))
+
+    print("Per-file timeouts:")
+    paths = list(find_resumes(directory))[:workers + 2]
+    counts, stats, elapsed = ingest(work_dir, directory, "timeouts", workers, timeout=0.001, paths=paths)
+    print(f"  {elapsed:6.2f}s  {counts}")
+    check("every file that ran out of time is recorded", counts["timed_out"] + counts["parsed"] == len(paths), str(counts))
+    check("files that timed out are indexed as failed", stats["failed"] == counts["failed"], str(stats))
+
+    print("Starting a session from the index:")
+    for name, ok, detail in asyncio.run(start_from_index(directory)):
+        check(name, ok, detail)
+
+    return check.summary()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resumes", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    sys.exit(main(args.resumes, args.workers))
@@ -0,0 +1,167 @@
+"""
+Session lifecycle benchmark: does a long-running worker reach a steady state?
+
+Serves `main.create_app` in-process with the scripted fake chat model and short expiry
+times, then runs rounds of new sessions, each with its own uploaded resume. After
+every round the sweeper runs and `/admin/sessions` is read. Without expiry, threads,
+uploads and the checkpoint database grow with every round; with it they level off
+once the oldest sessions expire. Also checks the per-session caps and the admin token.
+
+Exits with a non-zero status if any check fails.
+
+Usage (from the `api` directory):
+    python -m benchmarks.lifecycle --rounds 8 --sessions 10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from pypdf import PdfWriter
+
+from benchmarks.fakes import FakeChatModel
+from benchmarks.harness import Checks, asgi_client, isolate, read_events
+from benchmarks.resume_parsing import make_pdf
+
+ROUND_SECONDS = 1.0
+SETTINGS = {
+    "LLM_CACHE_ENABLED": "false",
+    # Sessions expire after about two rounds, their uploads right after
+    "CHECKPOINT_IDLE_TTL_SECONDS": 2 * ROUND_SECONDS,
+    "UPLOAD_TTL_SECONDS": ROUND_SECONDS,
+    "CHECKPOINT_MAINTENANCE_INTERVAL_SECONDS": 3600,
+    "MAX_SESSION_STATE_CHARS": 6000,
+    "MAX_TOOL_OUTPUT_CHARS": 200,
+    "ADMIN_TOKEN": "benchmark",
+}
+ADMIN = {"Authorization": "Bearer benchmark"}
+
+
+def make_fake_search():
+    from langchain_core.tools import tool
+
+    @tool("web_search")
+    async def web_search(query: str) -> str:
+        """A search engine useful for finding information about companies, their mission, and recent news."""
+        return "The company builds developer tools. " * 200
+
+    return web_search
+
+
+def resume_bytes(work_dir: str, number: int) -> bytes:
+    path = os.path.join(work_dir, "resume.pdf")
+    make_pdf(path, 1)
+    writer = PdfWriter(clone_from=path)
+    writer.add_metadata({"/Title": f"Candidate {number}"})
+    with open(path, "wb") as f:
+        writer.write(f)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def main(rounds: int, sessions: int) -> int:
+    work_dir = isolate("lifecycle-", SETTINGS)
+    uploads_dir = os.environ["UPLOADS_DIR"]
+    import main as api
+    import runs
+    from agent_logic import Services
+
+    # A legacy per-upload copy, as older versions left them in the uploads folder
+    os.makedirs(uploads_dir, exist_ok=True)
+    with open(os.path.join(uploads_dir, "0000_old-upload.pdf"), "wb") as f:
+        f.write(resume_bytes(work_dir, -1))
+
+    services = Services(FakeChatModel(latency=0.01, tokens_per_second=10000), make_fake_search())
+    check = Checks()
+
+    # A cached-text write that was interrupted a day ago
+    stale_text = os.path.join(services.resume_store.text_dir, f"{'0' * 64}.txt.1234.5678.tmp")
+    with open(stale_text, "w") as f:
+        f.write("partial text")
+    os.utime(stale_text, (time.time() - 86400, time.time() - 86400))
+
+    async def start(client, number: int, job_description: str = "Backend engineer at Acme. Python, FastAPI."):
+        files = {"resume": ("resume.pdf", resume_bytes(work_dir, number), "application/pdf")}
+        async with client.stream("POST", "/start", files=files, data={"job_description": job_description}) as response:
+            if response.status_code != 200:
+                await response.aread()
+                return response, []
+            return response, await read_events(response)
+
+    app = api.create_app(services)
+    async with asgi_client(app) as client:
+        print(f"{'round':>5} {'threads':>8} {'uploads':>8} {'upload KB':>10} {'checkpoint KB':>14} {'deleted':>8}")
+        history = []
+        for round_number in range(rounds):
+            await asyncio.gather(*(start(client, round_number * sessions + i) for i in range(sessions)))
+            await asyncio.sleep(ROUND_SECONDS)
+            swept = await app.state.lifecycle.sweep()
+            report = (await client.get("/admin/sessions", headers=ADMIN)).json()
+            history.append(report)
+            print(f"{round_number:>5} {report['sessions']['threads']:>8} {report['disk']['uploads']:>8} "
+                  f"{report['disk']['upload_bytes'] / 1024:>10.1f} {report['disk']['checkpoint_db_bytes'] / 1024:>14.1f} "
+                  f"{swept['uploads_deleted']:>8}")
+
+        tail = history[len(history) // 2:]
+        check("the thread count levels off", max(r["sessions"]["threads"] for r in tail) <= 3 * sessions,
+              str([r["sessions"]["threads"] for r in history]))
+        check("the uploads level off", max(r["disk"]["uploads"] for r in tail) <= 3 * sessions,
+              str([r["disk"]["uploads"] for r in history]))
+        check("the legacy upload copy is deleted", not os.path.exists(os.path.join(uploads_dir, "0000_old-upload.pdf")))
+        check("the interrupted text cache write is deleted", not os.path.exists(stale_text))
+        check("no stream is left running", history[-1]["sessions"]["streams"] == 0)
+        # A run stopped before the model searched: its prefetch must not outlive it
+        services.llm.latency = 60
+        stopped = asyncio.create_task(start(client, 9_999))
+        while not runs._live:
+            await asyncio.sleep(0.01)
+        for run in list(runs._live.values()):
+            run.task.cancel()
+        await stopped
+        services.llm.latency = 0.01
+        check("no company research prefetch outlives its run", not services.prefetcher._pending,
+              str(len(services.prefetcher._pending)))
+
+        print("Caps:")
+        response, events = await start(client, 10_000, "x" * 30_000)
+        check("an oversized job description is a 413", response.status_code == 413, str(response.status_code))
+
+        response, events = await start(client, 10_001)
+        session_id = events[0]["session_id"]
+        state = await services.agent_runnable.aget_state({"configurable": {"thread_id": session_id}})
+        tool_outputs = [m.content for m in state.values["messages"] if m.type == "tool"]
+        check("tool output stored in the thread is capped", tool_outputs and all(len(t) < 300 for t in tool_outputs),
+              str([len(t) for t in tool_outputs]))
+        response = await client.post("/feedback", json={"session_id": session_id, "feedback": "y" * 5_000})
+        check("feedback past the session size limit is a 413", response.status_code == 413, str(response.status_code))
+
+        print("Admin endpoint:")
+        response = await client.get("/admin/sessions")
+        check("the report needs the admin token", response.status_code == 401, str(response.status_code))
+        api.ADMIN_TOKEN = None
+        response = await client.get("/admin/sessions", headers=ADMIN)
+        api.ADMIN_TOKEN = "benchmark"
+        check("without ADMIN_TOKEN the report is a 404", response.status_code == 404, str(response.status_code))
+        report = (await client.get("/admin/sessions", headers=ADMIN)).json()
+        check("the report has the memory estimates", report["memory"]["rss_bytes"] and "stream_buffer_bytes" in report["memory"])
+        check("the report has the search cache size", report["disk"].get("search_cache_db_bytes", 0) > 0)
+
+        print("Caches:")
+        cache = services.search.cache
+        cache.set("expired query", "stale result")
+        with cache._lock:
+            cache._conn.execute(f"UPDATE {cache.TABLE} SET created_at = 0 WHERE key = ?", ("expired query",))
+            cache._conn.commit()
+        swept = await app.state.lifecycle.sweep()
+        check("expired search cache entries are purged", swept["cache_entries_purged"] >= 1, str(swept["cache_entries_purged"]))
+
+    return check.summary()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=8)
+    parser.add_argument("--sessions", type=int, default=10)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.rounds, args.sessions)))
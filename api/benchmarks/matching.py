@@ -0,0 +1,75 @@
+"""
+Measures the local resume/job matching stage.
+
+Times `match_resume` for a single resume/job pair (the summary added to every
+session's context message) and `score_many` for one resume against a batch of
+generated job descriptions (the ranking done by /batch), and prints the summary
+the model receives.
+
+Usage (from the `api` directory):
+    python -m benchmarks.matching --jobs 500 --repeat 20
+"""
+import argparse
+import random
+import statistics
+import time
+
+from matching import format_match_summary, match_resume, score_many
+
+RESUME = """Jane Doe - Senior Backend Engineer
+Senior Python engineer with 6 years of experience building backend services
+- Built REST APIs with FastAPI and PostgreSQL serving 2M requests per day
+- Led the migration of batch jobs to Kubernetes and AWS Lambda
+- Implemented machine learning pipelines with scikit-learn and PyTorch
+- Added Prometheus metrics and Grafana dashboards for every service
+- Mentored junior engineers and ran code reviews
+Skills: Python, FastAPI, Django, PostgreSQL, Redis, Docker, Kubernetes, AWS, CI/CD, Node.js
+"""
+SKILLS = [
+    "Python", "FastAPI", "Django", "Go", "Rust", "Java", "Kotlin", "PostgreSQL", "MySQL", "Redis", "Kafka",
+    "Kubernetes", "Terraform", "AWS", "GCP", "Azure", "React", "TypeScript", "GraphQL", "PyTorch",
+    "TensorFlow", "Spark", "Airflow", "LangChain", "Docker", "CI/CD", "machine learning", "data pipelines",
+]
+
+
+def make_job_description(rng: random.Random, index: int) -> str:
+    skills = rng.sample(SKILLS, 8)
+    return (
+        f"Company {index} is hiring a software engineer.\n"
+        f"You will build services in {skills[0]} and {skills[1]}.\n"
+        f"Experience with {skills[2]}, {skills[3]} and {skills[4]} is required.\n"
+        f"Familiarity with {skills[5]} or {skills[6]} is a plus, {skills[7]} is nice to have.\n"
+    )
+
+
+def timed(fn, repeat: int):
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        durations.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(durations), max(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    jobs = [make_job_description(rng, i) for i in range(args.jobs)]
+
+    summary, single_median, single_max = timed(lambda: match_resume(RESUME, jobs[0]), args.repeat)
+    scores, batch_median, batch_max = timed(lambda: score_many(RESUME, jobs), args.repeat)
+
+    print(format_match_summary(summary))
+    print()
+    print(f"match_resume (1 job):       median {single_median:7.2f} ms   max {single_max:7.2f} ms")
+    print(f"score_many ({args.jobs} jobs):   median {batch_median:7.2f} ms   max {batch_max:7.2f} ms")
+    best = scores.argsort()[::-1][:3]
+    print("Best matches: " + ", ".join(f"#{i} ({scores[i]:.2f})" for i in best))
+
+
+if __name__ == "__main__":
+    main()
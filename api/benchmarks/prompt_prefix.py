@@ -0,0 +1,70 @@
+"""
+Measures the per-turn overhead saved by preparing the tool-bound model once.
+
+Compares what `call_openai` used to do on every turn (bind the tools to the
+model and prepend a freshly built system message, then find tools with a
+linear scan) with the precomputed `Agent` attributes, using the real
+ChatOpenAI client and the real tool definitions. No network calls are made.
+
+Usage (from the `api` directory):
+    python -m benchmarks.prompt_prefix --turns 200
+"""
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from langchain_core.messages import SystemMessage
+from langchain_openai import ChatOpenAI
+
+from benchmarks.fakes import make_fake_search
+from mailer import build_mail_queue
+from resume_store import ResumeStore
+from search_cache import CachedSearch, SearchCache
+from tools import get_tools
+
+
+def per_turn_ms(fn, turns: int) -> float:
+    started = time.perf_counter()
+    for _ in range(turns):
+        fn()
+    return (time.perf_counter() - started) / turns * 1000
+
+
+def main(turns: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        search = CachedSearch(make_fake_search(0), SearchCache(os.path.join(tmp, "search.sqlite")))
+        tools = get_tools(ResumeStore(tmp), search, build_mail_queue())
+        llm = ChatOpenAI(model="gpt-4o", temperature=0.2, streaming=True)
+        system_prompt = "You are an intelligent AI Job Application Assistant. " * 40
+
+        def per_turn():
+            SystemMessage(content=system_prompt)
+            llm.bind_tools(tools)
+            for name in ("web_search", "send_email"):
+                next((t for t in tools if t.name == name), None)
+
+        system_message = SystemMessage(content=system_prompt)
+        llm_with_tools = llm.bind_tools(tools)
+        tools_by_name = {t.name: t for t in tools}
+
+        def precomputed():
+            [system_message]
+            llm_with_tools
+            for name in ("web_search", "send_email"):
+                tools_by_name.get(name)
+
+        before = per_turn_ms(per_turn, turns)
+        after = per_turn_ms(precomputed, turns)
+        print(f"prepare per turn:  {before:.3f} ms")
+        print(f"precomputed:       {after:.4f} ms")
+        print(f"saved per turn:    {before - after:.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+    main(args.turns)
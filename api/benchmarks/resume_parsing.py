@@ -0,0 +1,114 @@
+"""
+Measures event-loop latency while large resumes are parsed.
+
+Generates multi-page PDFs and long DOCX files, then parses them while a ticker
+coroutine records how late the event loop wakes it up. Parsing inline on the
+loop (`read_resume_file`) is compared with the process-pool path
+(`aread_resume_file`), which should keep the loop latency flat.
+
+Usage (from the `api` directory):
+    python -m benchmarks.resume_parsing --pages 10 50 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import docx
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from utils import aread_resume_file, get_parse_executor, read_resume_file
+
+LINES_PER_PAGE = 50
+TICK_SECONDS = 0.005
+
+
+def make_pdf(path: str, pages: int) -> None:
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for page_number in range(pages):
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+        lines = b" ".join(
+            b"(Page %d line %d: Built scalable Python services with FastAPI and LangGraph.) '" % (page_number, i)
+            for i in range(LINES_PER_PAGE)
+        )
+        content = DecodedStreamObject()
+        content.set_data(b"BT /F1 9 Tf 40 760 Td 14 TL " + lines + b" ET")
+        page[NameObject("/Contents")] = writer._add_object(content)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def make_docx(path: str, pages: int) -> None:
+    document = docx.Document()
+    for page_number in range(pages):
+        for i in range(LINES_PER_PAGE):
+            document.add_paragraph(f"Page {page_number} line {i}: Built scalable Python services with FastAPI and LangGraph.")
+    document.save(path)
+
+
+async def measure(parse) -> dict:
+    """
+    Runs `parse()` while sampling how late the event loop runs a periodic ticker.
+    """
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            expected = time.perf_counter() + TICK_SECONDS
+            await asyncio.sleep(TICK_SECONDS)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK_SECONDS * 2)
+    started = time.perf_counter()
+    await parse()
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticker_task
+
+    return {
+        "parse_s": elapsed,
+        "max_lag_ms": max(lags) * 1000,
+        "p50_lag_ms": statistics.median(lags) * 1000,
+    }
+
+
+async def main(page_counts) -> None:
+    # Warm the pool so process start-up is not counted in the first measurement
+    await asyncio.gather(*(asyncio.get_running_loop().run_in_executor(get_parse_executor(), os.getpid) for _ in range(8)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'file':<14}{'mode':<10}{'parse s':>9}{'max lag ms':>12}{'p50 lag ms':>12}")
+        for pages in page_counts:
+            for kind, make in (("pdf", make_pdf), ("docx", make_docx)):
+                path = os.path.join(tmp, f"resume_{pages}.{kind}")
+                make(path, pages)
+
+                async def inline():
+                    read_resume_file(path)
+
+                async def pooled():
+                    await aread_resume_file(path)
+
+                for mode, parse in (("inline", inline), ("pool", pooled)):
+                    result = await measure(parse)
+                    print(f"{f'{pages}p {kind}':<14}{mode:<10}{result['parse_s']:>9.3f}{result['max_lag_ms']:>12.1f}{result['p50_lag_ms']:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200])
+    args = parser.parse_args()
+    asyncio.run(main(args.pages))
@@ -0,0 +1,116 @@
+"""
+Startup benchmark for the API worker.
+
+- import time of `main` in a fresh interpreter, and which heavy libraries it loads
+- a uvicorn worker started from scratch: time until it accepts connections, until
+  `/ready` reports the agent graph warm, and until the first request that needs the
+  agent services (an unknown `/stream/{id}`, answered with 404) gets its response
+
+Every measurement runs in new processes, --runs times; medians are reported.
+The worker builds the real OpenAI and Tavily clients with dummy keys, but no
+OpenAI, Tavily or Gmail calls are made.
+
+Usage (from the `api` directory):
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.harness import app_env, free_port
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that should only be loaded by the warm-up, or not at all until they are used
+HEAVY_MODULES = ("agent_logic", "langgraph.graph", "langchain_openai", "langchain_tavily", "openai", "pypdf", "docx", "smtplib")
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def worker_env(work_dir: str) -> dict:
+    return {
+        **os.environ,
+        "OPENAI_API_KEY": "benchmark",
+        "TAVILY_API_KEY": "benchmark",
+        **app_env(work_dir),
+    }
+
+
+def measure_import(env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT], cwd=API_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_worker(env: dict, timeout: float = 120) -> dict:
+    """
+    Starts a uvicorn worker and polls it. Returns the seconds from process start until
+    the first response of any kind, until /ready is 200 and until the first agent request is answered.
+    """
+    port = free_port()
+    started = time.perf_counter()
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=API_DIR, env=env,
+    )
+    timings = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            while "ready_s" not in timings:
+                if time.perf_counter() - started > timeout:
+                    raise TimeoutError("The worker did not become ready.")
+                try:
+                    response = client.get("/ready")
+                except httpx.TransportError:
+                    time.sleep(0.01)
+                    continue
+                timings.setdefault("listening_s", time.perf_counter() - started)
+                if response.status_code == 200:
+                    timings["ready_s"] = time.perf_counter() - started
+                    timings["warmup_s"] = response.json()["warmup_seconds"]
+                else:
+                    time.sleep(0.01)
+            client.get("/stream/unknown")
+            timings["first_request_s"] = time.perf_counter() - started
+    finally:
+        worker.terminate()
+        worker.wait()
+    return timings
+
+
+def main(runs: int) -> None:
+    imports, workers = [], []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory(prefix="startup-") as work_dir:
+            env = worker_env(work_dir)
+            imports.append(measure_import(env))
+            workers.append(measure_worker(env))
+
+    print(f"import main:              {statistics.median(r['seconds'] for r in imports) * 1000:8.0f} ms")
+    loaded = sorted({m for r in imports for m in r["loaded"]})
+    print(f"heavy modules loaded:     {', '.join(loaded) if loaded else 'none'}")
+    print(f"accepting connections:    {statistics.median(w['listening_s'] for w in workers) * 1000:8.0f} ms")
+    print(f"ready (/ready is 200):    {statistics.median(w['ready_s'] for w in workers) * 1000:8.0f} ms"
+          f"  (warm-up {statistics.median(w['warmup_s'] for w in workers) * 1000:.0f} ms)")
+    print(f"first agent request:      {statistics.median(w['first_request_s'] for w in workers) * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    main(args.runs)
@@ -0,0 +1,128 @@
+"""
+Multi-draft benchmark: K alternative drafts in one request versus K serial `/feedback` rounds.
+
+Serves the app from `main.create_app` in-process with the scripted fake chat model, whose
+drafts name the sampling temperature so the variants differ. For each K it measures:
+
+- serial: `/start`, then K-1 "write another version" `/feedback` rounds
+- variants: one `/start` with variants=K, then committing the last variant with `/feedback`
+
+and checks that the variants are interleaved on one stream, that the chosen draft is the
+one the conversation continues from, and that the branch threads are deleted afterwards.
+
+Exits with a non-zero status if any check fails.
+
+Usage (from the `api` directory):
+    python -m benchmarks.variants --variants 2 3 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from langchain_core.messages import AIMessage
+
+from benchmarks.fakes import FakeChatModel, make_fake_search
+from benchmarks.harness import Checks, isolate, read_events, serve
+
+JOB_DESCRIPTION = "Backend engineer at Acme. Python, FastAPI."
+
+
+class SampledChatModel(FakeChatModel):
+    """
+    Fake model whose drafts say which temperature they were sampled at.
+    """
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+            yield chunk
+        if "temperature" in kwargs and chunk.message.content:
+            yield type(chunk)(message=type(chunk.message)(content=f"(t={kwargs['temperature']}) "))
+
+
+async def main(counts) -> int:
+    work_dir = isolate("variants-", {"LLM_CACHE_ENABLED": "false"})
+    import main as api
+    from agent_logic import Services
+    from benchmarks.resume_parsing import make_pdf
+    from variants import variant_thread_id
+
+    services = Services(SampledChatModel(latency=0.3, tokens_per_second=50), make_fake_search(0.2))
+    resume_path = os.path.join(work_dir, "resume.pdf")
+    make_pdf(resume_path, 1)
+    with open(resume_path, "rb") as f:
+        resume_bytes = f.read()
+
+    check = Checks()
+
+    async def post(client, path: str, **kwargs):
+        async with client.stream("POST", path, **kwargs) as response:
+            response.raise_for_status()
+            return await read_events(response)
+
+    def start(client, variants: int = 1):
+        return post(
+            client, "/start",
+            files={"resume": ("resume.pdf", resume_bytes, "application/pdf")},
+            data={"job_description": JOB_DESCRIPTION, "stream_mode": "tokens", "variants": str(variants)},
+        )
+
+    async def last_message(session_id: str):
+        state = await services.agent_runnable.aget_state({"configurable": {"thread_id": session_id}})
+        return state.values["messages"][-1]
+
+    async with serve(api.create_app(services)) as url, httpx.AsyncClient(base_url=url, timeout=None) as client:
+        for count in counts:
+            print(f"K={count}:")
+            started = time.perf_counter()
+            events = await start(client)
+            session_id = events[0]["session_id"]
+            for _ in range(count - 1):
+                await post(client, "/feedback", json={
+                    "session_id": session_id, "feedback": "Please write another version.", "stream_mode": "tokens",
+                })
+            serial = time.perf_counter() - started
+
+            started = time.perf_counter()
+            events = await start(client, count)
+            combined = time.perf_counter() - started
+            session_id = events[0]["session_id"]
+            finals = {e["variant"]: e["content"] for e in events if e["type"] == "final"}
+            tokens = [e["variant"] for e in events if e["type"] == "token"]
+            switches = sum(a != b for a, b in zip(tokens, tokens[1:]))
+            print(f"  serial rounds: {serial:6.2f}s   one request: {combined:6.2f}s   ({serial / combined:.1f}x)")
+            check("one final draft per variant", sorted(finals) == list(range(count)), str(sorted(finals)))
+            check("variant tokens are interleaved", switches >= count - 1, f"{switches} switches")
+            check("alternative drafts are sampled differently",
+                  all("(t=" in finals.get(i, "") for i in range(1, count)) and "(t=" not in finals.get(0, "(t="))
+            check("research ran once", sum(e["type"] == "tool_start" for e in events) == 1)
+
+            chosen = count - 1
+            events = await post(client, "/feedback", json={
+                "session_id": session_id, "feedback": "This one.", "variant": chosen, "stream_mode": "tokens",
+            })
+            state = await services.agent_runnable.aget_state({"configurable": {"thread_id": session_id}})
+            drafts = [m.content for m in state.values["messages"] if isinstance(m, AIMessage) and m.content]
+            check("the chosen draft is committed to the thread", drafts[0] == finals.get(chosen), drafts[0][-12:])
+            check("the conversation continues after the chosen draft", isinstance(await last_message(session_id), AIMessage))
+            branches = [
+                await services.storage.aget_tuple({"configurable": {"thread_id": variant_thread_id(session_id, i), "checkpoint_ns": ""}})
+                for i in range(1, count)
+            ]
+            check("the variant threads are deleted", all(b is None for b in branches))
+
+        response = await client.post("/feedback", json={"session_id": session_id, "feedback": "x", "variant": 1})
+        check("choosing a variant that does not exist is a 404", response.status_code == 404, str(response.status_code))
+        response = await client.post("/feedback", json={"session_id": session_id, "feedback": "x", "variants": 99})
+        check("too many variants is a 400", response.status_code == 400, str(response.status_code))
+
+    return check.summary()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", type=int, nargs="+", default=[2, 3, 4])
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.variants)))
@@ -0,0 +1,102 @@
+from typing import List
+
+from langchain_core.messages import AIMessage, AnyMessage, SystemMessage, ToolMessage
+
+# Rough size of a message's framing (role, separators) in tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+OMITTED_DRAFT = "[Earlier draft omitted, superseded by a later version.]"
+
+
+def append_messages(left: List[AnyMessage], right: List[AnyMessage]) -> List[AnyMessage]:
+    """
+    Reducer for AgentState.messages. New messages are appended and existing ones are never
+    rewritten, except that a message carrying the same id as the last message replaces it.
+    The left list itself is not mutated: LangGraph may still be serializing it for the
+    previous checkpoint while the next step runs.
+    """
+    if not right:
+        return left
+    if left and right[0].id is not None and right[0].id == left[-1].id:
+        return left[:-1] + right
+    return left + right
+
+
+def estimate_tokens(message: AnyMessage) -> int:
+    """
+    Approximates the token count of a message (~4 characters per token for English text).
+    """
+    size = len(message.content) if isinstance(message.content, str) else len(str(message.content))
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        size += len(tool_call["name"]) + len(str(tool_call["args"]))
+    return size // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+def count_tokens(messages: List[AnyMessage]) -> int:
+    return sum(estimate_tokens(m) for m in messages)
+
+
+def _is_draft(message: AnyMessage) -> bool:
+    return isinstance(message, AIMessage) and bool(message.content) and not message.tool_calls
+
+
+def _groups(messages: List[AnyMessage]) -> List[List[AnyMessage]]:
+    """
+    Splits messages into groups that must be kept or dropped together:
+    an AI message with tool calls stays with the tool results that answer it.
+    """
+    groups = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and groups:
+            groups[-1].append(message)
+        else:
+            groups.append([message])
+    return groups
+
+
+def trim_history(messages: List[AnyMessage], token_budget: int, pinned: int = 2, keep_recent: int = 6,
+                 tool_output_chars: int = 1500) -> List[AnyMessage]:
+    """
+    Returns the messages to send to the model, bounded to about `token_budget` tokens.
+
+    The first `pinned` messages (system prompt and the resume/JD context) and the last
+    `keep_recent` messages are kept verbatim. In between, tool outputs are truncated to
+    `tool_output_chars` and every draft except the latest one is replaced by a placeholder.
+    If that is still over budget, the oldest groups in between are dropped and replaced
+    by a single note. The stored state is never modified.
+    """
+    head, body = messages[:pinned], messages[pinned:]
+    groups = _groups(body)
+
+    # The recent window is counted in whole groups so tool calls keep their results
+    recent_groups, recent_count = [], 0
+    while groups and recent_count < keep_recent:
+        group = groups.pop()
+        recent_groups.insert(0, group)
+        recent_count += len(group)
+
+    latest_draft = next((m for m in reversed(messages) if _is_draft(m)), None)
+    older_groups = []
+    for group in groups:
+        compacted = []
+        for message in group:
+            if isinstance(message, ToolMessage) and len(message.content) > tool_output_chars:
+                message = message.model_copy(update={"content": message.content[:tool_output_chars] + " ...[truncated]"})
+            elif _is_draft(message) and message is not latest_draft:
+                message = message.model_copy(update={"content": OMITTED_DRAFT})
+            compacted.append(message)
+        older_groups.append(compacted)
+
+    recent = [m for group in recent_groups for m in group]
+    fixed_tokens = count_tokens(head) + count_tokens(recent)
+    older_tokens = [count_tokens(group) for group in older_groups]
+
+    dropped = 0
+    while older_groups and fixed_tokens + sum(older_tokens) > token_budget:
+        dropped += len(older_groups.pop(0))
+        older_tokens.pop(0)
+
+    older = [m for group in older_groups for m in group]
+    if dropped:
+        note = SystemMessage(content=f"[{dropped} earlier messages of this conversation were omitted to save space.]")
+        older = [note] + older
+    return head + older + recent
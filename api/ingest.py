@@ -0,0 +1,190 @@
+"""
+Bulk resume ingestion.
+
+Walks a directory for PDF and DOCX resumes, parses them in a process pool and stores the
+extracted text and metadata in the resume index (RESUME_INDEX_PATH). The files are also
+added to the resume store (UPLOADS_DIR), so a session can be started from an ingested
+resume with `POST /start` and `resume_id`, without uploading or parsing it again.
+
+Re-runs are incremental: files whose size and modification time are unchanged are skipped
+without being read, and files whose content is already indexed are not parsed again.
+A file that takes longer than --timeout seconds to parse is recorded as failed; the worker
+parsing it is killed and the pool restarted.
+
+Usage (from the `api` directory):
+    python ingest.py path/to/resumes --workers 8 --timeout 30
+"""
+import argparse
+import hashlib
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from typing import Iterator, List, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from resume_index import ResumeIndex
+from resume_store import SUPPORTED_EXTENSIONS, ResumeStore
+from utils import RESUME_PARSE_WORKERS, read_resume_file
+
+logger = logging.getLogger("ingest")
+
+# Default per-file parse timeout, in seconds
+INGEST_TIMEOUT_SECONDS = float(os.getenv("INGEST_TIMEOUT_SECONDS", "60"))
+
+
+def find_resumes(directory: str) -> Iterator[str]:
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                yield os.path.abspath(os.path.join(root, name))
+
+
+def parse_resume(path: str) -> Tuple[str, float]:
+    """
+    Runs in a pool process. Returns the text (or an "Error..." string) and the parse time.
+    """
+    started = time.perf_counter()
+    text = read_resume_file(path)
+    return text, time.perf_counter() - started
+
+
+class Ingestion:
+    """
+    One ingestion run: decides which files need parsing, parses them in a process pool
+    with per-file timeouts and writes the results to the index and the resume store.
+    """
+
+    def __init__(self, index: ResumeIndex, store: ResumeStore, workers: int, timeout: float, retry_failed: bool = False):
+        self.index = index
+        self.store = store
+        self.workers = workers
+        self.timeout = timeout
+        self.retry_failed = retry_failed
+        self.counts = {"unchanged": 0, "duplicate": 0, "parsed": 0, "failed": 0, "timed_out": 0}
+        self._queued = set()
+        # Files with the same content as a file queued in this run, recorded once it is parsed
+        self._copies = []
+
+    def prepare(self, path: str):
+        """
+        Returns the parse job (path, stat, resume_id, filename) for a file, or None if it is up to date.
+        """
+        stat = os.stat(path)
+        known = self.index.file(path)
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            entry = self.index.get(known[2])
+            if entry is not None and (entry["error"] is None or not self.retry_failed):
+                self.counts["unchanged"] += 1
+                return None
+
+        with open(path, "rb") as f:
+            data = f.read()
+        resume_id = hashlib.sha256(data).hexdigest()
+        # The store keeps a copy, so the resume can be attached to emails like an upload
+        self.store.put(data, path)
+        entry = self.index.get(resume_id)
+        if entry is not None and (entry["error"] is None or not self.retry_failed):
+            # Same content as a file indexed before (a copy, or a touched file)
+            self.index.add_file(path, stat.st_size, stat.st_mtime_ns, resume_id)
+            self.counts["duplicate"] += 1
+            return None
+        if resume_id in self._queued:
+            self._copies.append((path, stat, resume_id))
+            self.counts["duplicate"] += 1
+            return None
+        self._queued.add(resume_id)
+        return path, stat, resume_id, os.path.basename(path)
+
+    def record(self, job, text: str, seconds: float) -> None:
+        path, stat, resume_id, filename = job
+        self.index.add(resume_id, filename, stat.st_size, text, seconds)
+        self.index.add_file(path, stat.st_size, stat.st_mtime_ns, resume_id)
+        if text.startswith("Error"):
+            self.counts["failed"] += 1
+            logger.warning("%s: %s", path, text)
+        else:
+            self.counts["parsed"] += 1
+
+    def run(self, paths: List[str]) -> dict:
+        jobs = [job for job in map(self.prepare, paths) if job is not None]
+        if jobs:
+            self.parse(jobs)
+        for path, stat, resume_id in self._copies:
+            self.index.add_file(path, stat.st_size, stat.st_mtime_ns, resume_id)
+        return self.counts
+
+    def parse(self, jobs: list) -> None:
+        pending = list(reversed(jobs))
+        running = {}
+        pool = multiprocessing.Pool(self.workers)
+        try:
+            while pending or running:
+                # At most one file per worker is in flight, so a file's deadline starts when it is submitted
+                while pending and len(running) < self.workers:
+                    job = pending.pop()
+                    running[job] = (pool.apply_async(parse_resume, (job[0],)), time.monotonic() + self.timeout)
+
+                finished = [job for job, (result, _) in running.items() if result.ready()]
+                for job in finished:
+                    result, _ = running.pop(job)
+                    try:
+                        text, seconds = result.get()
+                    except Exception as e:
+                        text, seconds = f"Error reading file: {e}", 0.0
+                    self.record(job, text, seconds)
+
+                now = time.monotonic()
+                expired = [job for job, (_, deadline) in running.items() if now >= deadline]
+                if expired:
+                    # A worker stuck in a parser can't be interrupted; restart the pool and requeue the other files
+                    pool.terminate()
+                    pool.join()
+                    for job in expired:
+                        del running[job]
+                        self.counts["timed_out"] += 1
+                        self.record(job, f"Error: parsing took longer than {self.timeout:g}s.", self.timeout)
+                    pending.extend(running)
+                    running.clear()
+                    pool = multiprocessing.Pool(self.workers)
+                elif not finished:
+                    time.sleep(0.01)
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="folder with PDF and DOCX resumes, searched recursively")
+    parser.add_argument("--workers", type=int, default=RESUME_PARSE_WORKERS, help="parse processes")
+    parser.add_argument("--timeout", type=float, default=INGEST_TIMEOUT_SECONDS, help="seconds allowed per file")
+    parser.add_argument("--index", default=os.getenv("RESUME_INDEX_PATH", "resume_index.sqlite"), help="index database")
+    parser.add_argument("--uploads", default=os.getenv("UPLOADS_DIR", "uploads"), help="resume store directory")
+    parser.add_argument("--retry-failed", action="store_true", help="parse files that failed before again")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"{args.directory} is not a directory")
+    index = ResumeIndex(args.index)
+    ingestion = Ingestion(index, ResumeStore(args.uploads), args.workers, args.timeout, args.retry_failed)
+    started = time.perf_counter()
+    counts = ingestion.run(list(find_resumes(args.directory)))
+    logger.info(
+        "Ingested %s in %.1fs: %d parsed, %d failed (%d timed out), %d duplicate, %d unchanged",
+        args.directory, time.perf_counter() - started, counts["parsed"], counts["failed"],
+        counts["timed_out"], counts["duplicate"], counts["unchanged"],
+    )
+    logger.info("Index %s: %s", args.index, index.stats())
+    index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
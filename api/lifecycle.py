@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from resume_store import SUPPORTED_EXTENSIONS
+from runs import live_stats
+
+logger = logging.getLogger(__name__)
+
+# Expiry policy. Threads are pruned once finished (email sent) or idle for too long, and only
+# the newest checkpoints of a thread are kept. Uploaded resumes expire UPLOAD_TTL_SECONDS after
+# their last upload, but never while a thread still uses them; ingested resumes don't expire.
+SWEEP_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_MAINTENANCE_INTERVAL_SECONDS", "600"))
+CHECKPOINT_IDLE_TTL_SECONDS = float(os.getenv("CHECKPOINT_IDLE_TTL_SECONDS", str(7 * 24 * 3600)))
+CHECKPOINT_FINISHED_TTL_SECONDS = float(os.getenv("CHECKPOINT_FINISHED_TTL_SECONDS", str(24 * 3600)))
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "3"))
+UPLOAD_TTL_SECONDS = float(os.getenv("UPLOAD_TTL_SECONDS", str(24 * 3600)))
+# Half-written uploads left behind by a crashed worker
+STALE_UPLOAD_SECONDS = 3600
+
+# Per-session caps on what a session can add to its thread
+MAX_RESUME_CHARS = int(os.getenv("MAX_RESUME_CHARS", "50000"))
+MAX_JOB_DESCRIPTION_CHARS = int(os.getenv("MAX_JOB_DESCRIPTION_CHARS", "20000"))
+MAX_TOOL_OUTPUT_CHARS = int(os.getenv("MAX_TOOL_OUTPUT_CHARS", "8000"))
+MAX_SESSION_STATE_CHARS = int(os.getenv("MAX_SESSION_STATE_CHARS", "400000"))
+
+# Threads updated within this window count as active in the admin report
+ACTIVE_WINDOW_SECONDS = 3600
+
+
+def cap_text(text: str, limit: int) -> str:
+    """
+    Cuts `text` to `limit` characters, saying so at the end.
+    """
+    if len(text) <= limit:
+        return text
+    return text[:limit] + f"\n[... truncated {len(text) - limit} characters]"
+
+
+def state_chars(values: dict) -> int:
+    """
+    Size of a thread's state in characters: its messages and the job description.
+    """
+    messages = values.get("messages") or []
+    return sum(len(str(m.content)) for m in messages) + len(values.get("job_description") or "")
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _file_sizes(directory: str, suffix: str = "") -> tuple:
+    """
+    Returns (count, bytes) of the files directly in `directory` ending with `suffix`.
+    """
+    count = size = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0, 0
+    for entry in entries:
+        if entry.is_file() and entry.name.endswith(suffix):
+            count += 1
+            size += entry.stat().st_size
+    return count, size
+
+
+def _db_bytes(path: Optional[str]) -> int:
+    if not path:
+        return 0
+    return sum(os.path.getsize(p) for p in (path, path + "-wal", path + "-shm") if os.path.exists(p))
+
+
+class SessionLifecycle:
+    """
+    Keeps the disk and memory footprint of a long-running worker bounded.
+    `sweep` applies the expiry policy: it prunes and compacts the checkpoints, then deletes
+    expired uploads, their cached text and half-written uploads, and purges the expired entries
+    of `caches` (name -> SearchCache, e.g. the search and LLM response caches). `report`
+    describes the live sessions, the bytes on disk and estimates of the memory held per session.
+    Several workers may sweep the same files; deletions that lose the race are ignored.
+    """
+
+    def __init__(self, storage, resume_store, caches: Optional[dict] = None):
+        self.storage = storage
+        self.resume_store = resume_store
+        self.caches = {name: cache for name, cache in (caches or {}).items() if cache is not None}
+        self.last_sweep: Optional[dict] = None
+
+    async def sweep(self) -> dict:
+        started = time.perf_counter()
+        pruned = await self.storage.prune(CHECKPOINT_IDLE_TTL_SECONDS, CHECKPOINT_FINISHED_TTL_SECONDS)
+        compacted = await self.storage.compact(CHECKPOINT_KEEP_LAST)
+        # Read after the prune, so resumes of the threads just deleted can expire
+        in_use = await self.storage.resume_ids()
+        uploads, freed = await asyncio.to_thread(self._sweep_uploads, in_use)
+        purged = 0
+        for cache in self.caches.values():
+            purged += await asyncio.to_thread(cache.purge)
+        self.last_sweep = {
+            "at": time.time(),
+            "seconds": round(time.perf_counter() - started, 3),
+            "threads_pruned": pruned,
+            "checkpoints_compacted": compacted,
+            "uploads_deleted": uploads,
+            "bytes_freed": freed,
+            "cache_entries_purged": purged,
+        }
+        return self.last_sweep
+
+    def _sweep_uploads(self, in_use: set) -> tuple:
+        store = self.resume_store
+        now = time.time()
+        deleted = freed = 0
+
+        for entry in list(os.scandir(store.blobs_dir)):
+            resume_id, extension = os.path.splitext(entry.name)
+            try:
+                age = now - entry.stat().st_mtime
+                if extension == ".tmp":
+                    if age > STALE_UPLOAD_SECONDS:
+                        freed += entry.stat().st_size
+                        os.remove(entry.path)
+                        deleted += 1
+                    continue
+                if age <= UPLOAD_TTL_SECONDS or resume_id in in_use:
+                    continue
+                if store.index is not None and store.index.get(resume_id) is not None:
+                    continue
+            except FileNotFoundError:
+                continue
+            freed += store.forget(resume_id)
+            deleted += 1
+
+        # Cached text whose resume is gone, and text writes that were interrupted
+        for entry in list(os.scandir(store.text_dir)):
+            if entry.name.endswith(".tmp"):
+                try:
+                    if now - entry.stat().st_mtime > STALE_UPLOAD_SECONDS:
+                        freed += entry.stat().st_size
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+                continue
+            resume_id = entry.name.rsplit(".", 1)[0]
+            if store.path(resume_id) is None:
+                freed += store.forget(resume_id)
+
+        # Resumes in the top level of the uploads folder were stored by older versions, once per upload
+        for entry in list(os.scandir(store.root)):
+            if os.path.splitext(entry.name)[1].lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            try:
+                if entry.is_file() and now - entry.stat().st_mtime > UPLOAD_TTL_SECONDS:
+                    freed += entry.stat().st_size
+                    os.remove(entry.path)
+                    deleted += 1
+            except FileNotFoundError:
+                pass
+        return deleted, freed
+
+    async def run(self, interval_seconds: float = SWEEP_INTERVAL_SECONDS) -> None:
+        """
+        Sweeps every `interval_seconds`. Meant to run as a background task.
+        """
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                result = await self.sweep()
+                logger.info(
+                    "Sweep: pruned %d threads, compacted %d checkpoints, deleted %d uploads (%d bytes), "
+                    "purged %d cache entries",
+                    result["threads_pruned"], result["checkpoints_compacted"],
+                    result["uploads_deleted"], result["bytes_freed"], result["cache_entries_purged"],
+                )
+            except Exception:
+                logger.exception("Sweep failed")
+
+    async def report(self) -> dict:
+        store = self.resume_store
+        threads = await self.storage.thread_counts(time.time() - ACTIVE_WINDOW_SECONDS)
+
+        def disk():
+            blobs, blob_bytes = _file_sizes(store.blobs_dir)
+            # Includes temporary files left by interrupted writes
+            _, text_bytes = _file_sizes(store.text_dir)
+            legacy, legacy_bytes = _file_sizes(store.root)
+            return {
+                "uploads": blobs + legacy,
+                "upload_bytes": blob_bytes + legacy_bytes,
+                "text_cache_bytes": text_bytes,
+                "checkpoint_db_bytes": _db_bytes(getattr(self.storage, "db_path", None)),
+                "resume_index_bytes": _db_bytes(getattr(store.index, "db_path", None)),
+                **{f"{name}_db_bytes": _db_bytes(cache.db_path) for name, cache in self.caches.items()},
+            }
+
+        streams = live_stats()
+        cache = store.stats()
+        return {
+            "sessions": {**threads, "streams": streams["streams"], "stream_readers": streams["readers"]},
+            "disk": await asyncio.to_thread(disk),
+            "memory": {
+                "rss_bytes": _rss_bytes(),
+                "resume_text_cache_bytes": cache["memory_chars"],
+                "resume_text_cache_entries": cache["memory_entries"],
+                "stream_buffer_bytes": streams["buffered_bytes"],
+                "bytes_per_stream": streams["buffered_bytes"] // streams["streams"] if streams["streams"] else 0,
+            },
+            "policy": {
+                "checkpoint_idle_ttl_seconds": CHECKPOINT_IDLE_TTL_SECONDS,
+                "checkpoint_finished_ttl_seconds": CHECKPOINT_FINISHED_TTL_SECONDS,
+                "checkpoint_keep_last": CHECKPOINT_KEEP_LAST,
+                "upload_ttl_seconds": UPLOAD_TTL_SECONDS,
+                "max_resume_chars": MAX_RESUME_CHARS,
+                "max_job_description_chars": MAX_JOB_DESCRIPTION_CHARS,
+                "max_tool_output_chars": MAX_TOOL_OUTPUT_CHARS,
+                "max_session_state_chars": MAX_SESSION_STATE_CHARS,
+            },
+            "last_sweep": self.last_sweep,
+        }
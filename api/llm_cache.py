@@ -0,0 +1,83 @@
+import asyncio
+import hashlib
+import json
+import re
+import uuid
+from typing import List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from metrics import LLM_CACHE_LOOKUPS
+from search_cache import SearchCache
+
+
+class ResponseCache(SearchCache):
+    """
+    TTL cache for complete LLM responses, with the same memory LRU and SQLite tiers as the search cache.
+    """
+    TABLE = "llm_cache"
+
+
+def _normalize(messages: List[BaseMessage]) -> list:
+    """
+    Reduces messages to what the model actually sees. Tool call ids are generated per
+    request, so they are replaced by their position to let identical turns share a key.
+    """
+    call_ids = {}
+
+    def call_ref(call_id):
+        return call_ids.setdefault(call_id, len(call_ids))
+
+    normalized = []
+    for message in messages:
+        content = message.content
+        if isinstance(content, str):
+            content = re.sub(r"[ \t]+\n", "\n", content.strip())
+        entry = {"type": message.type, "content": content}
+        if isinstance(message, AIMessage) and message.tool_calls:
+            entry["tool_calls"] = [
+                {"name": tc["name"], "args": tc["args"], "ref": call_ref(tc["id"])} for tc in message.tool_calls
+            ]
+        if getattr(message, "tool_call_id", None):
+            entry["ref"] = call_ref(message.tool_call_id)
+        normalized.append(entry)
+    return normalized
+
+
+class CachedModel:
+    """
+    Exact-match response cache in front of a chat model.
+    The key is a hash of the normalized messages, the bound tool schemas, the model name
+    and the temperature, so only requests the model would see as identical share an entry.
+    """
+
+    def __init__(self, llm, tools, cache: ResponseCache):
+        self.cache = cache
+        model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or llm._llm_type
+        schemas = [convert_to_openai_tool(t) for t in tools]
+        self._prefix = json.dumps(
+            {"model": model, "temperature": getattr(llm, "temperature", None), "tools": schemas},
+            sort_keys=True, default=str,
+        )
+
+    def key(self, messages: List[BaseMessage]) -> str:
+        payload = self._prefix + json.dumps(_normalize(messages), sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[AIMessage]:
+        value = await asyncio.to_thread(self.cache.get, key)
+        if value is None:
+            LLM_CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        LLM_CACHE_LOOKUPS.labels("hit").inc()
+        message = messages_from_dict([json.loads(value)])[0]
+        # A replayed response is a new message in its thread
+        message.id = f"cached-{uuid.uuid4()}"
+        return message
+
+    async def set(self, key: str, response: AIMessage) -> None:
+        # Empty answers are usually a failed generation, never replay them
+        if not response.content and not response.tool_calls:
+            return
+        await asyncio.to_thread(self.cache.set, key, json.dumps(message_to_dict(response)))
@@ -0,0 +1,292 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
+
+# The SMTP and MIME modules are only imported once an email is actually sent
+if TYPE_CHECKING:
+    import smtplib
+    from email.message import Message
+    from email.mime.base import MIMEBase
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SMTP_HOST = "smtp.gmail.com"
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Whether a failed delivery is worth retrying: 4xx replies, dropped connections and
+    network errors are; 5xx replies (bad address, rejected message, bad login) are not.
+    """
+    import smtplib
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    # Other SMTPExceptions (e.g. an unsupported extension) fail the same way every time
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class SMTPPool:
+    """
+    A small pool of authenticated SMTP connections that are reused across emails
+    instead of connecting and logging in for every message.
+    """
+
+    def __init__(self, host: str, port: int, use_ssl: bool = True, username: Optional[str] = None,
+                 password: Optional[str] = None, size: int = 2, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self) -> "smtplib.SMTP":
+        import smtplib
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        return server
+
+    def acquire(self) -> "smtplib.SMTP":
+        import smtplib
+        # Reuse an idle connection if the server still answers, otherwise open a new one
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._discard(server)
+
+    def release(self, server: "smtplib.SMTP", broken: bool = False) -> None:
+        if broken:
+            self._discard(server)
+            return
+        try:
+            self._idle.put_nowait(server)
+        except queue.Full:
+            self._discard(server)
+
+    def send(self, msg: "Message") -> None:
+        import smtplib
+        server = self.acquire()
+        reusable = False
+        try:
+            server.send_message(msg)
+            reusable = True
+        except smtplib.SMTPServerDisconnected:
+            raise
+        except smtplib.SMTPException:
+            # The server refused this message; the connection is still usable once the transaction is reset
+            reusable = self._reset(server)
+            raise
+        finally:
+            # Any other failure (a socket or encoding error) leaves the connection in an unknown state
+            self.release(server, broken=not reusable)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    @staticmethod
+    def _reset(server: "smtplib.SMTP") -> bool:
+        import smtplib
+        try:
+            return server.rset()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _discard(server: "smtplib.SMTP") -> None:
+        import smtplib
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+
+class AttachmentCache:
+    """
+    LRU cache of base64-encoded MIME attachment parts, keyed by resume and file name,
+    so a resume is read and encoded once no matter how many emails it is attached to.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._parts: "OrderedDict[tuple, MIMEBase]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, resume_id: str, path: str, filename: str) -> "MIMEBase":
+        from email import encoders
+        from email.mime.base import MIMEBase
+
+        key = (resume_id, filename)
+        with self._lock:
+            part = self._parts.get(key)
+            if part is not None:
+                self._parts.move_to_end(key)
+                return part
+
+        with open(path, "rb") as attachment:
+            part = MIMEBase('application', 'octet-stream')
+            part.set_payload(attachment.read())
+        encoders.encode_base64(part)
+        part.add_header('Content-Disposition', f"attachment; filename= {filename}")
+
+        with self._lock:
+            self._parts[key] = part
+            while len(self._parts) > self.max_entries:
+                self._parts.popitem(last=False)
+        return part
+
+
+class MailQueue:
+    """
+    Asynchronous outbound email queue. `enqueue` returns a delivery id as soon as the message
+    is queued; background workers deliver it through the SMTP pool, retrying transient failures
+    with exponential backoff. Every status change of a delivery ("queued", then "sent" or
+    "failed") is passed to `on_status(delivery_id, session_id, status, error, recipient)`.
+    """
+
+    def __init__(self, pool: SMTPPool, workers: int = 2, max_retries: int = 3, backoff_seconds: float = 1.0,
+                 max_queue: int = 1000, on_status: Optional[Callable[..., Awaitable[None]]] = None):
+        self.pool = pool
+        self.on_status = on_status
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_queue = max_queue
+        self.attachments = AttachmentCache()
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks = []
+
+    def _ensure_workers(self) -> None:
+        # Workers are started lazily, on the event loop that sends the first email
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def enqueue(self, msg: "Message", session_id: Optional[str] = None) -> str:
+        self._ensure_workers()
+        delivery_id = uuid.uuid4().hex
+        await self._report(delivery_id, session_id, "queued", recipient=msg["To"])
+        await self._queue.put((delivery_id, msg, session_id))
+        return delivery_id
+
+    async def _worker(self) -> None:
+        while True:
+            delivery_id, msg, session_id = await self._queue.get()
+            try:
+                try:
+                    error = await self._deliver(delivery_id, msg)
+                except Exception as e:
+                    # A bad message must not take the worker down with it
+                    self.failed += 1
+                    logger.exception("Could not deliver email %s", delivery_id)
+                    error = str(e) or type(e).__name__
+                await self._report(delivery_id, session_id, "failed" if error else "sent", error)
+            finally:
+                self._queue.task_done()
+
+    async def _report(self, delivery_id: str, session_id: Optional[str], status: str,
+                      error: Optional[str] = None, recipient: Optional[str] = None) -> None:
+        if self.on_status is None:
+            return
+        try:
+            await self.on_status(delivery_id, session_id, status, error, recipient)
+        except Exception:
+            logger.exception("Could not record the status of email %s", delivery_id)
+
+    async def _deliver(self, delivery_id: str, msg: "Message") -> Optional[str]:
+        """
+        Sends one message, retrying transient failures. Returns None once it is delivered,
+        otherwise why it was not.
+        """
+        import smtplib
+        for attempt in range(self.max_retries + 1):
+            try:
+                await asyncio.to_thread(self.pool.send, msg)
+                self.sent += 1
+                logger.info("Delivered email %s to %s", delivery_id, msg["To"])
+                return None
+            except (smtplib.SMTPException, OSError) as e:
+                if not is_transient(e):
+                    self.failed += 1
+                    logger.error("Email %s to %s was rejected: %s", delivery_id, msg["To"], e)
+                    return f"The mail server rejected the email: {e}"
+                if attempt == self.max_retries:
+                    self.failed += 1
+                    logger.error("Giving up on email %s to %s: %s", delivery_id, msg["To"], e)
+                    return f"The email could not be delivered after {attempt + 1} attempts: {e}"
+                self.retries += 1
+                delay = self.backoff_seconds * 2 ** attempt
+                logger.warning("Email %s failed (%s), retrying in %.1fs", delivery_id, e, delay)
+                await asyncio.sleep(delay)
+
+    async def drain(self) -> None:
+        """
+        Waits for every queued email to be delivered (or given up on), then stops the workers.
+        """
+        if self._queue is not None:
+            await self._queue.join()
+        for task in self._worker_tasks:
+            task.cancel()
+        self._worker_tasks = []
+        self._queue = None
+        await asyncio.to_thread(self.pool.close)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+        }
+
+
+def build_mail_queue(on_status: Optional[Callable[..., Awaitable[None]]] = None) -> MailQueue:
+    """
+    Returns the mail queue configured from the environment, reporting delivery statuses to `on_status`.
+    SMTP_HOST / SMTP_PORT / SMTP_USE_SSL default to Gmail, and can point at a local
+    stand-in such as aiosmtpd (SMTP_USE_SSL=false) for tests and benchmarks.
+    """
+    pool = SMTPPool(
+        host=os.getenv("SMTP_HOST", DEFAULT_SMTP_HOST),
+        port=int(os.getenv("SMTP_PORT", "465")),
+        use_ssl=os.getenv("SMTP_USE_SSL", "true").lower() == "true",
+        username=os.getenv("SENDER_EMAIL"),
+        password=os.getenv("GMAIL_APP_PASSWORD"),
+        size=int(os.getenv("SMTP_POOL_SIZE", "2")),
+    )
+    return MailQueue(
+        pool,
+        workers=int(os.getenv("MAIL_WORKERS", "2")),
+        max_retries=int(os.getenv("MAIL_MAX_RETRIES", "3")),
+        backoff_seconds=float(os.getenv("MAIL_BACKOFF_SECONDS", "1.0")),
+        on_status=on_status,
+    )
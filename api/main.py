@@ -1,105 +1,537 @@
 import os
 import uuid
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
+import secrets
+import time
+import asyncio
+import logging
+import numpy as np
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, FastAPI, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage
 
 # Load environment variables at the very beginning
 load_dotenv()
 
+# The agent stack (agent_logic: LangGraph, the OpenAI and Tavily clients, the checkpointer)
+# is slow to import; it is loaded by the warm-up in the lifespan, not when this module is imported.
 from pydantic_models import StartRequest, UserFeedbackRequest
-from agent_logic import agent_runnable, read_resume_file
+from metrics import RUNS_STOPPED, SESSIONS_IN_FLIGHT, SSE_STREAM_DURATION, WARMUP_SECONDS, StatsCollector, render_metrics
+from prometheus_client import REGISTRY
+from matching import score_many
+from resume_store import UploadTooLarge
+from lifecycle import (
+    MAX_JOB_DESCRIPTION_CHARS, MAX_RESUME_CHARS, MAX_SESSION_STATE_CHARS, SessionLifecycle, cap_text, state_chars,
+)
+from runs import follow, is_live, repair_thread, start_run
+from scheduler import BULK, INTERACTIVE, STANDARD, SchedulerBusy
+from sse import DONE, dumps, encode, parse_event_id
+from streaming import FINAL, LLM_NODE, stream_agent_events
+from variants import MAX_DRAFT_VARIANTS, select_variant, stream_variants
 
-app = FastAPI()
+# Required as a bearer token by /admin/sessions when set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+logger = logging.getLogger(__name__)
+
+
+def build_services():
+    from agent_logic import Services
+    return Services()
+
+
+async def warm_up(app: FastAPI) -> None:
+    """
+    Builds this worker's services (unless they were passed to `create_app`), warms the agent
+    graph and starts the background maintenance. Runs as a task, so the worker accepts
+    connections right away and `/ready` reports when it is done.
+    """
+    started = time.perf_counter()
+    if app.state.services is None:
+        # Importing the agent stack takes seconds; a thread keeps the event loop free meanwhile
+        app.state.services = await asyncio.to_thread(build_services)
+    services = app.state.services
+    await services.warm_up()
+
+    app.state.collector = StatsCollector(services.search, services.mail_queue, services.scheduler)
+    REGISTRY.register(app.state.collector)
+    # Expired threads, checkpoints and uploads are swept in the background
+    app.state.lifecycle = SessionLifecycle(
+        services.storage, services.resume_store,
+        caches={"search_cache": services.search.cache, "llm_cache": services.response_cache},
+    )
+    app.state.maintenance = asyncio.create_task(app.state.lifecycle.run())
+    app.state.warmup_seconds = time.perf_counter() - started
+    WARMUP_SECONDS.set(app.state.warmup_seconds)
+    logger.info("Worker ready after %.2fs", app.state.warmup_seconds)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.warm_up = asyncio.create_task(warm_up(app))
+    yield
+    if not app.state.warm_up.done():
+        app.state.warm_up.cancel()
+    await asyncio.gather(app.state.warm_up, return_exceptions=True)
+    if app.state.warm_up.cancelled() or app.state.warm_up.exception() is not None:
+        return
+    app.state.maintenance.cancel()
+    REGISTRY.unregister(app.state.collector)
+    await app.state.services.aclose()
+
+
+async def get_services(request: Request):
+    """
+    Returns the worker's services. Requests that arrive during the warm-up wait for it to finish.
+    """
+    try:
+        # Shielded, so a client that goes away does not cancel the warm-up
+        await asyncio.shield(request.app.state.warm_up)
+    except Exception:
+        raise HTTPException(status_code=503, detail="The service failed to start.")
+    return request.app.state.services
+
+
+router = APIRouter()
+
+StreamMode = Literal["messages", "tokens"]
+
+# Uploads are streamed to disk in chunks and rejected once they pass the size limit
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(256 * 1024)))
+
+# Deadline for one agent run; the run is cancelled and its thread left resumable when it passes
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "300"))
+
+# How many agent runs of one /batch request execute at the same time
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "5"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "50"))
+
+
+async def read_upload_chunks(upload: UploadFile):
+    while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+        yield chunk
+
+
+async def instrumented(stream, endpoint: str):
+    """
+    Wraps an SSE generator to track the stream duration.
+    """
+    started = time.perf_counter()
+    try:
+        async for event in stream:
+            yield event
+    finally:
+        SSE_STREAM_DURATION.labels(endpoint).observe(time.perf_counter() - started)
+
+
+def stream_response(run, request: Request, storage, endpoint: str) -> StreamingResponse:
+    """
+    Streams a run to the client. The `X-Stream-ID` header names the stream for `GET /stream/{stream_id}`.
+    """
+    stream = instrumented(follow(run.stream_id, request, storage), endpoint)
+    return StreamingResponse(stream, media_type="text/event-stream", headers={"X-Stream-ID": run.stream_id})
+
+
+def error_response(error: str) -> StreamingResponse:
+    async def error_stream():
+        yield encode(dumps({"error": error}))
+        yield encode(DONE)
+    return StreamingResponse(error_stream(), media_type="text/event-stream")
+
+
+def admit(scheduler, priority: str) -> None:
+    """
+    Turns away a request with 429 when the LLM queue of its priority class is full.
+    """
+    try:
+        scheduler.admit(priority)
+    except SchedulerBusy as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+async def token_events(runnable, inputs, config, session_id: str = None):
+    """
+    Yields typed events (token, tool_start, tool_end, queued, final) as the agent produces them,
+    so the client can render the draft progressively instead of waiting for the whole message.
+    """
+    try:
+        async for event in stream_agent_events(runnable, inputs, config):
+            if session_id:
+                event["session_id"] = session_id
+            yield event
+    except SchedulerBusy as e:
+        # The queue filled up after the request was admitted
+        yield {"type": "error", "error": str(e), "status": 429, "retry_after": e.retry_after}
+
+
+async def message_events(runnable, inputs, config, session_id: str = None):
+    """
+    Yields one {"content": ...} event per complete agent reply (stream_mode="messages").
+    """
+    try:
+        async for update in runnable.astream(inputs, config=config, stream_mode="updates"):
+            for message in (update.get(LLM_NODE) or {}).get("messages", []):
+                if isinstance(message, AIMessage) and message.content and not message.tool_calls:
+                    event = {"content": message.content}
+                    if session_id:
+                        event["session_id"] = session_id
+                    yield event
+    except SchedulerBusy as e:
+        yield {"error": str(e), "status": 429, "retry_after": e.retry_after}
+
+
+async def variant_events(runnable, inputs, config, session_id: str = None, count: int = 1, stream_mode: str = "tokens"):
+    """
+    Yields the events of `count` alternative drafts, tagged with their `variant` index.
+    With stream_mode="messages" only one {"content": ..., "variant": ...} event per draft is sent.
+    """
+    try:
+        async for event in stream_variants(runnable, inputs, config, count):
+            if stream_mode == "messages":
+                if event["type"] != FINAL:
+                    continue
+                event = {"content": event["content"], "variant": event["variant"]}
+            if session_id:
+                event["session_id"] = session_id
+            yield event
+    except SchedulerBusy as e:
+        yield {"type": "error", "error": str(e), "status": 429, "retry_after": e.retry_after}
+
+
+def agent_events(stream_mode: str, variants: int):
+    """
+    Picks the event producer for a request: one reply in the given stream mode, or several draft variants.
+    """
+    if not 1 <= variants <= MAX_DRAFT_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"variants must be between 1 and {MAX_DRAFT_VARIANTS}.")
+    if variants > 1:
+        return lambda *args: variant_events(*args, count=variants, stream_mode=stream_mode)
+    return token_events if stream_mode == "tokens" else message_events
+
+
+async def store_resume(resume_store, resume: UploadFile):
+    """
+    Saves the uploaded resume (identical files are stored only once) and reads its content.
+    Returns (resume_id, resume_content); resume_content starts with "Error:" if the file can't be read.
+    """
+    try:
+        resume_id = await resume_store.put_stream(read_upload_chunks(resume), resume.filename, MAX_UPLOAD_BYTES)
+        # Read the resume content off the event loop, cached after the first parse of these bytes
+        return resume_id, await resume_store.atext(resume_id)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        return None, f"Error: {e}"
 
-# Configure CORS to allow frontend to communicate with the backend
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allows all origins
-    allow_credentials=True,
-    allow_methods=["*"],  # Allows all methods
-    allow_headers=["*"],  # Allows all headers
-)
 
-UPLOADS_DIR = "uploads"
-os.makedirs(UPLOADS_DIR, exist_ok=True)
+async def load_resume(resume_store, resume: Optional[UploadFile], resume_id: Optional[str]):
+    """
+    Returns (resume_id, resume_name, resume_content) for a request that either uploads a resume
+    or names one that is already stored, e.g. imported with ingest.py, by its `resume_id`.
+    """
+    if (resume is None) == (resume_id is None):
+        raise HTTPException(status_code=400, detail="Send either a resume file or a resume_id.")
+    if resume is not None:
+        resume_id, resume_content = await store_resume(resume_store, resume)
+        return resume_id, resume.filename, cap_text(resume_content, MAX_RESUME_CHARS)
+
+    path = resume_store.path(resume_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Unknown resume_id.")
+    entry = await asyncio.to_thread(resume_store.index.get, resume_id) if resume_store.index is not None else None
+    resume_name = entry["filename"] if entry else "resume" + os.path.splitext(path)[1]
+    return resume_id, resume_name, cap_text(await resume_store.atext(resume_id), MAX_RESUME_CHARS)
+
 
-@app.post("/start")
+def check_job_description(job_description: str) -> None:
+    if len(job_description) > MAX_JOB_DESCRIPTION_CHARS:
+        raise HTTPException(
+            status_code=413, detail=f"A job description can be at most {MAX_JOB_DESCRIPTION_CHARS} characters long.",
+        )
+
+@router.post("/start")
 async def start_conversation(
-    resume: UploadFile = File(...), 
-    job_description: str = Form(...)
+    request: Request,
+    resume: Optional[UploadFile] = File(None),
+    job_description: str = Form(...),
+    stream_mode: StreamMode = Form("messages"),
+    no_cache: bool = Form(False),
+    variants: int = Form(1),
+    resume_id: Optional[str] = Form(None),
+    services=Depends(get_services)
 ):
     """
     Endpoint to start a new job application process.
-    It saves the resume, creates a new session, and starts the agent.
+    It stores the resume (once per unique file), creates a new session, and starts the agent.
+    Instead of uploading the resume, a stored or ingested one can be named by its `resume_id`.
+    With stream_mode="tokens" the response streams typed events token by token.
+    With no_cache=true the model is always called, even for a request it has answered before.
+    With variants=K the first draft is written K times, concurrently and on the same research;
+    the events carry a `variant` index and the chosen one is committed with /feedback.
+    The run is cancelled if the client disconnects or it takes longer than REQUEST_TIMEOUT_SECONDS.
     """
+    from agent_logic import build_context_message
+
+    events = agent_events(stream_mode, variants)
+    check_job_description(job_description)
+    admit(services.scheduler, STANDARD)
     session_id = str(uuid.uuid4())
     
-    # Save the uploaded resume
-    resume_path = os.path.join(UPLOADS_DIR, f"{session_id}_{resume.filename}")
-    with open(resume_path, "wb") as buffer:
-        buffer.write(await resume.read())
-
-    # Read the resume content
-    resume_content = read_resume_file(resume_path)
+    resume_id, resume_name, resume_content = await load_resume(services.resume_store, resume, resume_id)
     if "Error:" in resume_content:
         # Handle cases where the file couldn't be read
-        async def error_stream():
-            yield f"data: {{\"error\": \"{resume_content}\"}}\n\n"
-        return StreamingResponse(error_stream(), media_type="text/event-stream")
-
-    # Initial prompt for the agent
-    initial_prompt = (
-        f"Here is my resume:\n---RESUME---\n{resume_content}\n\n"
-        f"Here is the job description I want to apply for:\n---JOB DESCRIPTION---\n{job_description}"
-    )
+        return error_response(resume_content)
+    # The resume is kept on disk as long as the session exists
+    await services.storage.link_resume(session_id, resume_id)
+
+    # Initial prompt for the agent, pinned as the first message of the thread
+    initial_message = build_context_message(resume_content, job_description)
     
     # The configuration for the LangGraph stream
-    config = {"configurable": {"thread_id": session_id}}
+    config = {"configurable": {"thread_id": session_id, "no_cache": no_cache, "priority": STANDARD}}
+    inputs = {
+        "messages": [initial_message],
+        "resume_id": resume_id,
+        "resume_name": resume_name,
+        "job_description": job_description,
+    }
+
+    # Research the company while the first LLM call is still analysing the resume
+    services.prefetcher.start(session_id, job_description)
+
+    agent_runnable = services.agent_runnable
+    run = start_run(
+        events(agent_runnable, inputs, config, session_id), services.storage, agent_runnable, [config],
+        REQUEST_TIMEOUT_SECONDS,
+        # A prefetch the model never asked for is dropped once the run ends
+        on_done=lambda: services.prefetcher.discard(session_id),
+    )
+    return stream_response(run, request, services.storage, "start")
+
+
+@router.post("/batch")
+async def start_batch(
+    request: Request,
+    resume: Optional[UploadFile] = File(None),
+    job_descriptions: List[str] = Form(...),
+    stream_mode: StreamMode = Form("messages"),
+    no_cache: bool = Form(False),
+    resume_id: Optional[str] = Form(None),
+    services=Depends(get_services)
+):
+    """
+    Endpoint to apply to many jobs with one resume.
+    The resume is stored and parsed once, then one agent session is started per job description.
+    Like /start, it takes either a resume upload or the `resume_id` of a stored resume.
+    At most BATCH_CONCURRENCY sessions run at the same time, and all of their events are
+    multiplexed into a single stream, tagged with the job description `index` and `session_id`.
+    Sessions start in order of their `match_score`, best match first.
+    With stream_mode="messages" token events are left out and only tool, queued and final events are sent.
+    """
+    if len(job_descriptions) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {MAX_BATCH_SIZE} job descriptions.")
+    for job_description in job_descriptions:
+        check_job_description(job_description)
+    from agent_logic import build_context_message
+
+    admit(services.scheduler, BULK)
+
+    resume_id, resume_name, resume_content = await load_resume(services.resume_store, resume, resume_id)
+    if "Error:" in resume_content:
+        return error_response(resume_content)
+
+    sessions = [str(uuid.uuid4()) for _ in job_descriptions]
+    for session_id in sessions:
+        await services.storage.link_resume(session_id, resume_id)
+    # Rank the jobs by how well the resume fits; the best matches get the first slots
+    scores = score_many(resume_content, job_descriptions)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    events = asyncio.Queue()
+    agent_runnable, prefetcher = services.agent_runnable, services.prefetcher
+
+    async def run_session(index: int, session_id: str, job_description: str):
+        config = {"configurable": {"thread_id": session_id, "no_cache": no_cache, "priority": BULK}}
+        inputs = {
+            "messages": [build_context_message(resume_content, job_description)],
+            "resume_id": resume_id,
+            "resume_name": resume_name,
+            "job_description": job_description,
+        }
+        async def forward():
+            async for event in stream_agent_events(agent_runnable, inputs, config):
+                if stream_mode == "messages" and event["type"] == "token":
+                    continue
+                await events.put({**event, "index": index, "session_id": session_id})
+
+        async with semaphore:
+            SESSIONS_IN_FLIGHT.inc()
+            prefetcher.start(session_id, job_description)
+            try:
+                # Each session gets its own deadline; one stuck session does not hold up the batch
+                await asyncio.wait_for(forward(), REQUEST_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                RUNS_STOPPED.labels("deadline").inc()
+                await repair_thread(agent_runnable, config)
+                error = f"The session did not finish within {REQUEST_TIMEOUT_SECONDS:g}s and was cancelled."
+                await events.put({"type": "error", "error": error, "index": index, "session_id": session_id})
+            except Exception as e:
+                await events.put({"type": "error", "error": str(e), "index": index, "session_id": session_id})
+            finally:
+                prefetcher.discard(session_id)
+                SESSIONS_IN_FLIGHT.dec()
 
     async def event_stream():
-        # Stream the agent's response
-        async for chunk in agent_runnable.astream(
-            {"messages": [HumanMessage(content=initial_prompt)], "resume_path": resume_path},
-            config=config
-        ):
-            # The output of the stream is the entire state, we only need the last message
-            if "messages" in chunk:
-                last_message = chunk["messages"][-1]
-                if last_message.content:
-                    yield f"data: {{\"content\": \"{last_message.content}\", \"session_id\": \"{session_id}\"}}\n\n"
-        
-        # Signal that the stream is complete
-        yield "data: [DONE]\n\n"
-
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
-
-
-@app.post("/feedback")
-async def continue_conversation(request: UserFeedbackRequest):
+        # Announce every session up front so the client can map indexes to session ids
+        for index, session_id in enumerate(sessions):
+            yield {"type": "session", "index": index, "session_id": session_id, "match_score": round(float(scores[index]), 3)}
+
+        tasks = [
+            asyncio.create_task(run_session(int(index), sessions[index], job_descriptions[index]))
+            for index in np.argsort(-scores, kind="stable")
+        ]
+        all_done = asyncio.gather(*tasks)
+        all_done.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+        finally:
+            # Stop the remaining sessions if the run is cancelled
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Sessions are counted as in flight by run_session, and each has its own deadline
+    configs = [{"configurable": {"thread_id": session_id}} for session_id in sessions]
+    run = start_run(event_stream(), services.storage, agent_runnable, configs, sessions=0)
+    return stream_response(run, request, services.storage, "batch")
+
+
+@router.post("/feedback")
+async def continue_conversation(request: UserFeedbackRequest, http_request: Request, services=Depends(get_services)):
     """
     Endpoint to continue the conversation with user feedback or approval.
+    Feedback turns are interactive: their LLM calls are scheduled ahead of /start and /batch work.
+    Like /start, the run is cancelled on client disconnect or after REQUEST_TIMEOUT_SECONDS.
+    `variant` commits the chosen draft of a multi-draft reply before the feedback is applied,
+    and `variants` asks for several drafts of the next reply.
     """
-    config = {"configurable": {"thread_id": request.session_id}}
+    events = agent_events(request.stream_mode, request.variants)
+    admit(services.scheduler, INTERACTIVE)
+    config = {"configurable": {"thread_id": request.session_id, "no_cache": request.no_cache, "priority": INTERACTIVE}}
+    agent_runnable = services.agent_runnable
+    if request.variant is not None:
+        try:
+            await select_variant(agent_runnable, config, request.variant)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
     
     # The user's feedback becomes the new message for the agent
     user_message = request.feedback
     if request.recipient_email:
         user_message += f"\nRecipient Email: {request.recipient_email}"
 
-    async def event_stream():
-        # Stream the agent's response
-        async for chunk in agent_runnable.astream(
-            {"messages": [HumanMessage(content=user_message)]},
-            config=config
-        ):
-            if "messages" in chunk:
-                last_message = chunk["messages"][-1]
-                if last_message.content:
-                    yield f"data: {{\"content\": \"{last_message.content}\"}}\n\n"
-        
-        yield "data: [DONE]\n\n"
-
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
+    # A session can only grow so far; past the cap the user has to start a new one
+    state = await agent_runnable.aget_state(config)
+    if state_chars(state.values or {}) + len(user_message) > MAX_SESSION_STATE_CHARS:
+        raise HTTPException(status_code=413, detail="This session has reached its size limit. Please start a new one.")
+
+    inputs = {"messages": [HumanMessage(content=user_message)]}
+
+    run = start_run(events(agent_runnable, inputs, config), services.storage, agent_runnable, [config], REQUEST_TIMEOUT_SECONDS)
+    return stream_response(run, http_request, services.storage, "feedback")
+
+
+@router.get("/stream/{stream_id}")
+async def resume_stream(stream_id: str, request: Request, last_event_id: str = None, services=Depends(get_services)):
+    """
+    Reconnects to the stream of a /start, /batch or /feedback request.
+    Events after the one named by the `Last-Event-ID` header (or the `last_event_id` query
+    parameter, for clients that cannot set headers) are sent again, then the stream continues live.
+    The agent is not run again; a run whose client went away keeps going for RECONNECT_GRACE_SECONDS.
+    """
+    owner, after = parse_event_id(request.headers.get("last-event-id") or last_event_id)
+    if owner is not None and owner != stream_id:
+        raise HTTPException(status_code=400, detail="Last-Event-ID belongs to a different stream.")
+    storage = services.storage
+    if not is_live(stream_id) and not await storage.stream_events(stream_id, after=0, limit=1):
+        raise HTTPException(status_code=404, detail="Unknown or expired stream.")
+    return StreamingResponse(
+        instrumented(follow(stream_id, request, storage, after), "stream"),
+        media_type="text/event-stream",
+        headers={"X-Stream-ID": stream_id},
+    )
+
+
+@router.get("/sessions/{session_id}/emails")
+async def session_emails(session_id: str, services=Depends(get_services)):
+    """
+    Delivery status of the emails a session queued: "queued", then "sent" or "failed" with the error.
+    `send_email` returns once the email is queued, so this is where a failed delivery shows up.
+    """
+    return {"session_id": session_id, "emails": await services.storage.deliveries(session_id)}
+
+
+@router.get("/ready")
+async def ready(request: Request):
+    """
+    Readiness probe: 200 once this worker has built and warmed the agent graph, 503 while
+    it is still warming up or if the warm-up failed. Use it as the load balancer health check.
+    """
+    warm_up = request.app.state.warm_up
+    if not warm_up.done():
+        return JSONResponse({"status": "warming_up"}, status_code=503)
+    if warm_up.cancelled() or warm_up.exception() is not None:
+        error = "cancelled" if warm_up.cancelled() else str(warm_up.exception())
+        return JSONResponse({"status": "failed", "error": error}, status_code=503)
+    return {"status": "ready", "warmup_seconds": round(request.app.state.warmup_seconds, 3)}
+
+
+@router.get("/admin/sessions")
+async def admin_sessions(request: Request, services=Depends(get_services)):
+    """
+    Lifecycle report of this worker: stored and live sessions, bytes on disk (uploads, text
+    cache, checkpoint database, resume index), memory estimates, the expiry policy and the
+    result of the last sweep. Requires `Authorization: Bearer <ADMIN_TOKEN>`; without ADMIN_TOKEN
+    the endpoint does not exist.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(request.headers.get("authorization", ""), f"Bearer {ADMIN_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+    return await request.app.state.lifecycle.report()
+
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics: per-node latencies, token usage, errors, in-flight sessions and stream durations.
+    """
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+def create_app(services=None) -> FastAPI:
+    """
+    Builds the API app. The agent services are built per worker by the lifespan, or can be
+    passed in (e.g. with a fake model for benchmarks).
+    """
+    app = FastAPI(lifespan=lifespan)
+    app.state.services = services
+
+    # Configure CORS to allow frontend to communicate with the backend
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Allows all origins
+        allow_credentials=True,
+        allow_methods=["*"],  # Allows all methods
+        allow_headers=["*"],  # Allows all headers
+    )
+    app.include_router(router)
+    return app
+
+
+app = create_app()
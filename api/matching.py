@@ -0,0 +1,178 @@
+import re
+from typing import Dict, List
+
+import numpy as np
+
+# Filler words of job descriptions and resumes that say nothing about a skill
+STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being both but by can could do does
+for from had has have having he her his how i if in into is it its job just may me more most must my
+new not of on or our out over own per please plus role same she should so some such than that the their
+them then there these they this those through to under up us very via was we well were what when where
+which while who will with within without would you your
+ability able across advantage applicants apply based benefits best candidate candidates company
+competitive culture day degree desired environment equal etc excellent experience experienced familiarity
+good great help hiring ideal including join knowledge looking make minimum nice opportunity passion passionate
+position preferred proven related required requirements responsibilities responsible salary seeking
+skills strong team teams understanding using work working world year years
+""".split())
+
+# Keeps tech spellings such as c++, c#, node.js and ci/cd in one token
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#./\-]*[a-z0-9+#]|[a-z]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercases `text` and returns its terms: single words plus two-word phrases
+    ("machine learning"), with stopwords and plain numbers left out.
+    """
+    words = _TOKEN.findall(text.lower())
+    terms = []
+    previous = None
+    for word in words:
+        if word in STOPWORDS or word.replace(".", "").isdigit():
+            previous = None
+            continue
+        terms.append(word)
+        if previous is not None:
+            terms.append(f"{previous} {word}")
+        previous = word
+    return terms
+
+
+def _term_counts(docs: List[List[str]], vocabulary: Dict[str, int], grow: bool = False):
+    """
+    Counts the terms of every doc as sparse parallel (row, term, count) arrays.
+    With `grow`, unseen terms are added to `vocabulary`, otherwise they are ignored.
+    """
+    rows, cols = [], []
+    for row, terms in enumerate(docs):
+        if grow:
+            ids = [vocabulary.setdefault(term, len(vocabulary)) for term in terms]
+        else:
+            ids = [vocabulary[term] for term in terms if term in vocabulary]
+        cols.extend(ids)
+        rows.extend([row] * len(ids))
+    keys, counts = np.unique(
+        np.asarray(rows, dtype=np.int64) * (len(vocabulary) + 1) + np.asarray(cols, dtype=np.int64),
+        return_counts=True,
+    )
+    return keys // (len(vocabulary) + 1), keys % (len(vocabulary) + 1), counts
+
+
+def _tfidf(rows: np.ndarray, cols: np.ndarray, counts: np.ndarray, idf: np.ndarray, n_rows: int) -> np.ndarray:
+    """
+    Returns the tf-idf weight of every (row, term) entry, L2 normalized per row.
+    """
+    weights = (1 + np.log(counts)) * idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights ** 2, minlength=n_rows))
+    return weights / np.maximum(norms, 1e-12)[rows]
+
+
+def _idf(cols: np.ndarray, n_terms: int, n_docs: int) -> np.ndarray:
+    # Every (row, term) entry is unique, so counting terms gives the document frequency
+    df = np.bincount(cols, minlength=n_terms)
+    return np.log((1 + n_docs) / (1 + df)) + 1
+
+
+def _dense(cols: np.ndarray, weights: np.ndarray, n_terms: int) -> np.ndarray:
+    vector = np.zeros(n_terms)
+    vector[cols] = weights
+    return vector
+
+
+def score_many(resume_text: str, job_descriptions: List[str]) -> np.ndarray:
+    """
+    Returns the tf-idf cosine similarity between the resume and each job description, in order.
+    Document frequencies come from the job descriptions themselves, so terms every posting
+    shares count less than the ones that set a posting apart.
+    """
+    if not job_descriptions:
+        return np.zeros(0)
+    vocabulary = {}
+    rows, cols, counts = _term_counts([tokenize(jd) for jd in job_descriptions], vocabulary, grow=True)
+    idf = _idf(cols, len(vocabulary), len(job_descriptions))
+    weights = _tfidf(rows, cols, counts, idf, len(job_descriptions))
+
+    resume_rows, resume_cols, resume_counts = _term_counts([tokenize(resume_text)], vocabulary)
+    resume_vector = _dense(resume_cols, _tfidf(resume_rows, resume_cols, resume_counts, idf, 1), len(vocabulary))
+    return np.bincount(rows, weights * resume_vector[cols], minlength=len(job_descriptions))
+
+
+def match_resume(resume_text: str, job_description: str, top_k: int = 12, top_lines: int = 5) -> dict:
+    """
+    Compares one resume with one job description.
+    Returns the overall `score`, the most important job terms found in the resume
+    (`matched_skills`) and missing from it (`gaps`), and the resume lines most
+    relevant to the job (`relevant_lines`).
+    Lines of both documents serve as the corpus for the idf weights.
+    """
+    resume_lines = [line.strip(" \t-•*") for line in resume_text.splitlines()]
+    resume_lines = [line for line in resume_lines if len(line) >= 20]
+    jd_lines = [line for line in job_description.splitlines() if line.strip()]
+    line_terms = [tokenize(line) for line in resume_lines + jd_lines]
+    if not line_terms:
+        return {"score": 0.0, "matched_skills": [], "gaps": [], "relevant_lines": []}
+    vocabulary = {}
+    line_rows, line_cols, line_counts = _term_counts(line_terms, vocabulary, grow=True)
+    idf = _idf(line_cols, len(vocabulary), len(line_terms))
+
+    resume_terms = tokenize(resume_text)
+    _, jd_cols, jd_counts = _term_counts([tokenize(job_description)], vocabulary)
+    jd_weights = _tfidf(np.zeros_like(jd_cols), jd_cols, jd_counts, idf, 1)
+    jd_vector = _dense(jd_cols, jd_weights, len(vocabulary))
+    _, resume_cols, resume_counts = _term_counts([resume_terms], vocabulary)
+    resume_weights = _tfidf(np.zeros_like(resume_cols), resume_cols, resume_counts, idf, 1)
+    score = float(resume_weights @ jd_vector[resume_cols])
+
+    # Job terms by importance, split by whether the resume mentions them
+    in_resume = np.zeros(len(vocabulary), dtype=bool)
+    in_resume[resume_cols] = True
+    order = jd_cols[np.argsort(-jd_weights, kind="stable")]
+    terms = list(vocabulary)
+    matched = _distinct([terms[i] for i in order if in_resume[i]], top_k)
+    # A phrase is not a gap when the resume has each of its words, just not side by side
+    resume_words = set(resume_terms)
+    gaps = _distinct(
+        [terms[i] for i in order if not in_resume[i] and not set(terms[i].split()) <= resume_words], top_k,
+    )
+
+    relevant = []
+    if resume_lines:
+        # Resume lines come first in the corpus, so their rows are 0..len(resume_lines)-1
+        in_lines = line_rows < len(resume_lines)
+        rows, cols = line_rows[in_lines], line_cols[in_lines]
+        weights = _tfidf(rows, cols, line_counts[in_lines], idf, len(resume_lines))
+        line_scores = np.bincount(rows, weights * jd_vector[cols], minlength=len(resume_lines))
+        best = np.argsort(-line_scores, kind="stable")[:top_lines]
+        relevant = [resume_lines[i] for i in best if line_scores[i] > 0]
+
+    return {"score": round(score, 3), "matched_skills": matched, "gaps": gaps, "relevant_lines": relevant}
+
+
+def _distinct(terms: List[str], limit: int) -> List[str]:
+    """
+    Keeps the first `limit` terms, skipping words already covered by a phrase (and vice versa).
+    """
+    kept = []
+    for term in terms:
+        words = set(term.split())
+        if any(words <= set(k.split()) or set(k.split()) <= words for k in kept):
+            continue
+        kept.append(term)
+        if len(kept) == limit:
+            break
+    return kept
+
+
+def format_match_summary(summary: dict) -> str:
+    """
+    Renders a match summary as the compact text block that goes into the prompt.
+    """
+    lines = [f"Match score: {summary['score']:.2f}"]
+    lines.append("Matched skills: " + (", ".join(summary["matched_skills"]) or "none"))
+    lines.append("Gaps: " + (", ".join(summary["gaps"]) or "none"))
+    if summary["relevant_lines"]:
+        lines.append("Most relevant experience:")
+        lines.extend(f"- {line}" for line in summary["relevant_lines"])
+    return "\n".join(lines)
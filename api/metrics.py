@@ -0,0 +1,123 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Structured per-request trace logs, one JSON line per LLM/tool call keyed by session_id
+TRACE_LOGGING = os.getenv("TRACE_LOGGING", "false").lower() == "true"
+trace_logger = logging.getLogger("trace")
+
+LLM_LATENCY = Histogram(
+    "agent_llm_call_seconds", "Latency of LLM calls made by the agent",
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
+LLM_TOKENS = Counter("agent_llm_tokens_total", "Tokens used by LLM calls", ["kind"])
+LLM_ERRORS = Counter("agent_llm_errors_total", "LLM calls that raised an error")
+LLM_QUEUE_WAIT = Histogram(
+    "agent_llm_queue_wait_seconds", "Time LLM calls waited for the scheduler, by priority class", ["priority"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60),
+)
+LLM_QUEUE_REJECTED = Counter("agent_llm_queue_rejected_total", "Requests rejected because the LLM queue was full", ["priority"])
+LLM_CACHE_LOOKUPS = Counter("agent_llm_cache_lookups_total", "LLM response cache lookups by result (hit, miss, bypass)", ["result"])
+
+TOOL_LATENCY = Histogram(
+    "agent_tool_call_seconds", "Latency of tool calls by tool name", ["tool"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+TOOL_ERRORS = Counter("agent_tool_errors_total", "Tool calls that failed, by tool name", ["tool"])
+PREFETCH_OUTCOMES = Counter(
+    "agent_research_prefetch_total", "Speculative company research by outcome (started, served, unused)", ["outcome"],
+)
+
+RESUME_PARSE_LATENCY = Histogram(
+    "resume_parse_seconds", "Time spent extracting text from resumes", ["format"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+RESUME_PARSE_ERRORS = Counter("resume_parse_errors_total", "Resumes that could not be parsed", ["format"])
+
+CHECKPOINT_LATENCY = Histogram(
+    "checkpoint_operation_seconds", "Latency of checkpoint storage operations", ["operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+CHECKPOINT_ERRORS = Counter("checkpoint_errors_total", "Checkpoint storage operations that failed", ["operation"])
+
+RUNS_STOPPED = Counter("agent_runs_stopped_total", "Agent runs stopped before finishing, by reason", ["reason"])
+SESSIONS_IN_FLIGHT = Gauge("agent_sessions_in_flight", "Agent runs currently streaming to a client", multiprocess_mode="livesum")
+WARMUP_SECONDS = Gauge("agent_warmup_seconds", "Time the worker took to build and warm the agent services", multiprocess_mode="max")
+SSE_STREAM_DURATION = Histogram(
+    "sse_stream_seconds", "Duration of SSE responses by endpoint", ["endpoint"],
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300),
+)
+
+
+class StatsCollector:
+    """
+    Exposes the counters kept by the search cache, the mail queue and the LLM scheduler.
+    """
+
+    def __init__(self, search, mail_queue, scheduler=None):
+        self.search = search
+        self.mail_queue = mail_queue
+        self.scheduler = scheduler
+
+    def collect(self):
+        search = self.search.stats()
+        lookups = CounterMetricFamily("search_cache_lookups", "web_search lookups by result", labels=["result"])
+        for result in ("hits", "misses", "shared"):
+            lookups.add_metric([result], search[result])
+        yield lookups
+        yield GaugeMetricFamily("search_inflight_requests", "Search backend requests in flight", value=search["inflight"])
+
+        mail = self.mail_queue.stats()
+        yield GaugeMetricFamily("mail_queue_depth", "Emails waiting for delivery", value=mail["queued"])
+        emails = CounterMetricFamily("mail_deliveries", "Email delivery outcomes", labels=["outcome"])
+        for outcome in ("sent", "failed", "retries"):
+            emails.add_metric([outcome], mail[outcome])
+        yield emails
+
+        if self.scheduler is not None:
+            llm = self.scheduler.stats()
+            yield GaugeMetricFamily("agent_llm_calls_active", "LLM calls holding a scheduler slot", value=llm["active"])
+            depth = GaugeMetricFamily("agent_llm_queue_depth", "LLM calls waiting for a slot, by priority class", labels=["priority"])
+            for priority, queued in llm["queued"].items():
+                depth.add_metric([priority], queued)
+            yield depth
+            if llm["tokens_available"] is not None:
+                yield GaugeMetricFamily("agent_llm_tokens_available", "Tokens left in the LLM rate budget", value=llm["tokens_available"])
+
+
+@contextmanager
+def observe(histogram, errors, *labels):
+    """
+    Times the enclosed block into `histogram` and counts exceptions in `errors`.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        (errors.labels(*labels) if labels else errors).inc()
+        raise
+    finally:
+        (histogram.labels(*labels) if labels else histogram).observe(time.perf_counter() - started)
+
+
+def trace(session_id, event: str, **fields) -> None:
+    if TRACE_LOGGING:
+        trace_logger.info(json.dumps({"session_id": session_id, "event": event, **fields}, default=str))
+
+
+def render_metrics():
+    """
+    Returns (body, content type) for the /metrics endpoint. Under gunicorn, set
+    PROMETHEUS_MULTIPROC_DIR to aggregate the metrics of all worker processes.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
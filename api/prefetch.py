@@ -0,0 +1,108 @@
+import asyncio
+import re
+import time
+from typing import Optional
+
+from metrics import PREFETCH_OUTCOMES
+from search_cache import CachedSearch
+
+# Capitalized phrase of up to four words, e.g. "Acme Robotics" or "Bank of America"
+_WORD = r"[A-Z][\w&'\-]*(?:\.[\w&'\-]+)*"
+_NAME = r"(" + _WORD + r"(?:[ \t]+(?:of[ \t]+)?" + _WORD + r"){0,3})"
+_COMPANY_PATTERNS = [
+    re.compile(r"^\s*(?:Company|Organization|Organisation|Employer)(?:\s+Name)?\s*[:\-]\s*(.+?)\s*$", re.IGNORECASE | re.MULTILINE),
+    re.compile(_NAME + r"\s+is\s+(?:hiring|looking|seeking|searching)"),
+    re.compile(r"\b(?i:about)[ \t]+" + _NAME),
+    re.compile(r"\b(?i:at|join|joining)[ \t]+" + _NAME),
+]
+# Capitalized words that start sentences in job descriptions but are not company names
+_NOT_COMPANIES = {
+    "we", "our", "us", "the", "you", "your", "this", "a", "an", "role", "the role", "job", "the job",
+    "team", "the team", "company", "the company", "position", "the position", "remote",
+}
+_LEGAL_SUFFIX = re.compile(r"[\s,]+(?:Inc|Inc\.|LLC|Ltd|Ltd\.|GmbH|Corp|Corp\.|Co\.|PLC|Pvt\.? Ltd\.?)$")
+
+
+def guess_company(job_description: str) -> Optional[str]:
+    """
+    Extracts the hiring company's name from a job description with cheap local heuristics.
+    Returns None when no plausible name is found.
+    """
+    for pattern in _COMPANY_PATTERNS:
+        for match in pattern.finditer(job_description):
+            name = _LEGAL_SUFFIX.sub("", match.group(1).strip(" .,:;!"))
+            if name and name.lower() not in _NOT_COMPANIES and len(name) <= 60:
+                return name
+    return None
+
+
+class ResearchPrefetcher:
+    """
+    Starts the company research for a session while its first LLM call is still running.
+    When the model then asks `web_search` about the same company, `take` hands back the
+    prefetched result instead of issuing another search, removing one serial hop.
+    """
+
+    def __init__(self, search: CachedSearch, ttl_seconds: float = 600):
+        self.search = search
+        self.ttl_seconds = ttl_seconds
+        self._pending = {}
+
+    def start(self, session_id: str, job_description: str) -> Optional[str]:
+        """
+        Begins the background search for the company named in the job description.
+        Must be called from the event loop. Returns the company name, or None if none was found.
+        """
+        self._expire()
+        company = guess_company(job_description)
+        if company is None:
+            return None
+        task = asyncio.ensure_future(self.search.search(f"{company} company mission and recent news"))
+        # A failed prefetch only means the model's own search runs as usual
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._pending[session_id] = (company, task, time.monotonic())
+        PREFETCH_OUTCOMES.labels("started").inc()
+        return company
+
+    async def take(self, session_id: str, query: str) -> Optional[str]:
+        """
+        Returns the prefetched research for this session if `query` is about the same company,
+        otherwise None. Each prefetch is served at most once.
+        """
+        entry = self._pending.pop(session_id, None)
+        if entry is None:
+            return None
+        company, task, _ = entry
+        words = [w for w in re.findall(r"\w+", company.lower()) if len(w) > 1]
+        if not words or not all(w in query.lower() for w in words):
+            # The result still lands in the search cache, the model's own query just runs as usual
+            PREFETCH_OUTCOMES.labels("unused").inc()
+            return None
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # The prefetch was handed to this caller only, so it stops when the caller gives up
+            task.cancel()
+            raise
+        except Exception:
+            PREFETCH_OUTCOMES.labels("unused").inc()
+            return None
+        PREFETCH_OUTCOMES.labels("served").inc()
+        return result
+
+    def discard(self, session_id: str) -> None:
+        """
+        Drops the session's prefetch and stops its search if the run ended without using it.
+        """
+        entry = self._pending.pop(session_id, None)
+        if entry is not None:
+            entry[1].cancel()
+            PREFETCH_OUTCOMES.labels("unused").inc()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for session_id, (_, task, created) in list(self._pending.items()):
+            if now - created > self.ttl_seconds:
+                task.cancel()
+                del self._pending[session_id]
+                PREFETCH_OUTCOMES.labels("unused").inc()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional
 
 class StartRequest(BaseModel):
     """
@@ -16,3 +16,7 @@ class UserFeedbackRequest(BaseModel):
     session_id: str
     feedback: str # e.g., "approve", "regenerate", or specific change requests
     recipient_email: Optional[str] = None # Only needed for the final send step
+    stream_mode: Literal["messages", "tokens"] = "messages" # "tokens" streams typed events token by token
+    no_cache: bool = False # Always call the model, skipping the LLM response cache
+    variant: Optional[int] = None # The chosen draft of a multi-draft reply, committed before the feedback
+    variants: int = 1 # Number of alternative drafts to write for the next reply
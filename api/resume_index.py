@@ -0,0 +1,96 @@
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional
+
+
+class ResumeIndex:
+    """
+    SQLite index of parsed resumes, filled by the bulk ingestion tool (ingest.py).
+
+    `resumes` holds the extracted text (zlib-compressed) and metadata of every resume, keyed
+    by its resume_id (the SHA-256 of the file, as in ResumeStore). Files that could not be
+    parsed are kept with their error, so re-runs don't retry them until they change.
+    `files` maps every ingested path to its size and mtime, so unchanged files are skipped
+    on re-runs without reading them.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS resumes ("
+            " resume_id TEXT PRIMARY KEY, filename TEXT NOT NULL, size INTEGER NOT NULL,"
+            " chars INTEGER NOT NULL, text BLOB, error TEXT, parse_seconds REAL NOT NULL, indexed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, resume_id TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def text(self, resume_id: str) -> Optional[str]:
+        """
+        Returns the indexed text of a resume, or None if it is not indexed or could not be parsed.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM resumes WHERE resume_id = ? AND error IS NULL", (resume_id,)
+            ).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def get(self, resume_id: str) -> Optional[dict]:
+        """
+        Returns the metadata of an indexed resume (without its text), or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT filename, size, chars, error, parse_seconds, indexed_at FROM resumes WHERE resume_id = ?",
+                (resume_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("filename", "size", "chars", "error", "parse_seconds", "indexed_at")
+        return {"resume_id": resume_id, **dict(zip(keys, row))}
+
+    def file(self, path: str) -> Optional[tuple]:
+        """
+        Returns (size, mtime_ns, resume_id) recorded for a path at its last ingestion, or None.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT size, mtime_ns, resume_id FROM files WHERE path = ?", (path,)
+            ).fetchone()
+
+    def add(self, resume_id: str, filename: str, size: int, text: str, parse_seconds: float) -> None:
+        """
+        Stores a parse result. `text` is either the resume text or an "Error..." string.
+        """
+        error = text if text.startswith("Error") else None
+        data = None if error else zlib.compress(text.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resumes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (resume_id, filename, size, 0 if error else len(text), data, error, parse_seconds, time.time()),
+            )
+            self._conn.commit()
+
+    def add_file(self, path: str, size: int, mtime_ns: int, resume_id: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (path, size, mtime_ns, resume_id))
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            indexed, failed, chars = self._conn.execute(
+                "SELECT COUNT(error IS NULL OR NULL), COUNT(error), COALESCE(SUM(chars), 0) FROM resumes"
+            ).fetchone()
+            files = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        return {"resumes": indexed, "failed": failed, "chars": chars, "files": files}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
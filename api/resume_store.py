@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Optional
+
+from metrics import RESUME_PARSE_ERRORS, RESUME_PARSE_LATENCY
+from resume_index import ResumeIndex
+from utils import aread_resume_file, read_resume_file
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+
+# resume_ids are SHA-256 hex digests; anything else can't name a stored file
+_RESUME_ID = re.compile(r"[0-9a-f]{64}")
+
+
+class UploadTooLarge(ValueError):
+    """
+    Raised when a streamed upload exceeds the configured maximum size.
+    """
+
+
+class ResumeStore:
+    """
+    Content-addressed storage for uploaded resumes.
+
+    Files are keyed by the SHA-256 of their bytes, so identical uploads are written once
+    and share one `resume_id`. Extracted text is memoized in two tiers: a size-bounded
+    in-memory LRU and a persistent `.txt` file next to the original, so a resume is
+    only ever parsed once. Resumes imported in bulk by ingest.py have their text in
+    `index` instead, which is looked up after the `.txt` files.
+    """
+
+    def __init__(self, root: str, max_memory_chars: int = 5_000_000, index: Optional[ResumeIndex] = None):
+        self.root = root
+        self.index = index
+        self.blobs_dir = os.path.join(root, "blobs")
+        self.text_dir = os.path.join(root, "text")
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        os.makedirs(self.text_dir, exist_ok=True)
+
+        self.max_memory_chars = max_memory_chars
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_chars = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def resume_id_for(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def put(self, data: bytes, filename: str) -> str:
+        """
+        Stores the resume bytes (if not stored already) and returns its resume_id.
+        """
+        extension = self._extension(filename)
+        resume_id = self.resume_id_for(data)
+        blob_path = os.path.join(self.blobs_dir, resume_id + extension)
+        if os.path.exists(blob_path):
+            # The modification time is the last upload, which the upload sweeper expires by
+            os.utime(blob_path)
+        else:
+            self._write_atomic(blob_path, data)
+        return resume_id
+
+    async def put_stream(self, chunks: AsyncIterator[bytes], filename: str, max_bytes: Optional[int] = None) -> str:
+        """
+        Streams an upload to disk chunk by chunk, hashing as it goes, and returns its resume_id.
+        The whole file is never held in memory. Raises UploadTooLarge past `max_bytes`.
+        """
+        extension = self._extension(filename)
+        hasher = hashlib.sha256()
+        size = 0
+        tmp_path = os.path.join(self.blobs_dir, f"upload-{uuid.uuid4().hex}.tmp")
+
+        f = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLarge(f"Resume exceeds the maximum upload size of {max_bytes} bytes.")
+                hasher.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+        f.close()
+
+        resume_id = hasher.hexdigest()
+        blob_path = os.path.join(self.blobs_dir, resume_id + extension)
+        if os.path.exists(blob_path):
+            os.remove(tmp_path)
+            os.utime(blob_path)
+        else:
+            os.replace(tmp_path, blob_path)
+        return resume_id
+
+    def path(self, resume_id: str) -> Optional[str]:
+        """
+        Returns the file path of a stored resume, or None if it is unknown.
+        """
+        if not _RESUME_ID.fullmatch(resume_id or ""):
+            return None
+        for extension in SUPPORTED_EXTENSIONS:
+            blob_path = os.path.join(self.blobs_dir, resume_id + extension)
+            if os.path.exists(blob_path):
+                return blob_path
+        return None
+
+    def text(self, resume_id: str) -> str:
+        """
+        Returns the extracted text of a stored resume, parsing the file only on a cache miss.
+        Errors are returned as "Error: ..." strings, like `read_resume_file`, and never cached.
+        """
+        cached = self._cached_text(resume_id)
+        if cached is not None:
+            return cached
+
+        blob_path = self.path(resume_id)
+        if blob_path is None:
+            return "Error: Resume file not found."
+        started = time.perf_counter()
+        text = read_resume_file(blob_path)
+        self._observe_parse(blob_path, text, started)
+        return self._remember(resume_id, text)
+
+    async def atext(self, resume_id: str) -> str:
+        """
+        Async version of `text`: cache lookups run in a thread and parsing in the process pool.
+        """
+        cached = self._memory_get(resume_id)
+        if cached is None:
+            cached = await asyncio.to_thread(self._cached_text, resume_id)
+        if cached is not None:
+            return cached
+
+        blob_path = self.path(resume_id)
+        if blob_path is None:
+            return "Error: Resume file not found."
+        started = time.perf_counter()
+        text = await aread_resume_file(blob_path)
+        self._observe_parse(blob_path, text, started)
+        return await asyncio.to_thread(self._remember, resume_id, text)
+
+    def forget(self, resume_id: str) -> int:
+        """
+        Deletes a stored resume and its cached text. Returns the number of bytes freed on disk.
+        """
+        with self._lock:
+            text = self._memory.pop(resume_id, None)
+            if text is not None:
+                self._memory_chars -= len(text)
+        freed = 0
+        paths = [os.path.join(self.blobs_dir, resume_id + extension) for extension in SUPPORTED_EXTENSIONS]
+        for path in paths + [os.path.join(self.text_dir, resume_id + ".txt")]:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                freed += size
+            except FileNotFoundError:
+                pass
+        return freed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"memory_entries": len(self._memory), "memory_chars": self._memory_chars}
+
+    @staticmethod
+    def _observe_parse(blob_path: str, text: str, started: float) -> None:
+        file_format = os.path.splitext(blob_path)[1].lstrip(".")
+        RESUME_PARSE_LATENCY.labels(file_format).observe(time.perf_counter() - started)
+        if text.startswith("Error"):
+            RESUME_PARSE_ERRORS.labels(file_format).inc()
+
+    def _cached_text(self, resume_id: str) -> Optional[str]:
+        cached = self._memory_get(resume_id)
+        if cached is not None:
+            return cached
+
+        text_path = os.path.join(self.text_dir, resume_id + ".txt")
+        if os.path.exists(text_path):
+            with open(text_path, "r", encoding="utf-8") as f:
+                text = f.read()
+            self._memory_put(resume_id, text)
+            return text
+
+        if self.index is not None:
+            text = self.index.text(resume_id)
+            if text is not None:
+                self._memory_put(resume_id, text)
+                return text
+        return None
+
+    def _remember(self, resume_id: str, text: str) -> str:
+        if text.startswith("Error"):
+            return text
+        self._write_atomic(os.path.join(self.text_dir, resume_id + ".txt"), text.encode("utf-8"))
+        self._memory_put(resume_id, text)
+        return text
+
+    def _memory_get(self, resume_id: str) -> Optional[str]:
+        with self._lock:
+            text = self._memory.get(resume_id)
+            if text is not None:
+                self._memory.move_to_end(resume_id)
+            return text
+
+    def _memory_put(self, resume_id: str, text: str) -> None:
+        if len(text) > self.max_memory_chars:
+            return
+        with self._lock:
+            if resume_id in self._memory:
+                return
+            self._memory[resume_id] = text
+            self._memory_chars += len(text)
+            # Evict least recently used entries until we are back under the budget
+            while self._memory_chars > self.max_memory_chars:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_chars -= len(evicted)
+
+    @staticmethod
+    def _extension(filename: str) -> str:
+        extension = os.path.splitext(filename or "")[1].lower()
+        if extension not in SUPPORTED_EXTENSIONS:
+            raise ValueError("Unsupported file format. Please upload a PDF or DOCX file.")
+        return extension
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        # Write to a temporary file first so readers never see a half-written file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import os
+import uuid
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, ToolMessage
+from starlette.requests import Request
+
+from metrics import RUNS_STOPPED, SESSIONS_IN_FLIGHT
+from sse import DONE, HEARTBEAT, dumps, encode, event_id
+
+logger = logging.getLogger(__name__)
+
+# How often a stream checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "1"))
+# Idle streams send a heartbeat comment this often
+HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# A run whose client disconnected keeps going this long, so the client can reconnect
+# with Last-Event-ID; after that it is cancelled. 0 cancels right away.
+RECONNECT_GRACE_SECONDS = float(os.getenv("RECONNECT_GRACE_SECONDS", "10"))
+# Events are written to the event log at least this often while a run streams tokens
+EVENT_FLUSH_SECONDS = float(os.getenv("EVENT_FLUSH_SECONDS", "0.25"))
+# A replay of a run owned by another process gives up after this long without new events
+REPLAY_IDLE_TIMEOUT_SECONDS = float(os.getenv("REPLAY_IDLE_TIMEOUT_SECONDS", "60"))
+
+CANCELLED_TOOL_OUTPUT = "Error: the tool call was cancelled before it finished; its action may not have completed."
+
+# Runs of this process that are still streaming, by stream id
+_live: Dict[str, "StreamRun"] = {}
+
+
+class StreamRun:
+    """
+    One agent run, decoupled from the HTTP response that started it.
+    Every event it produces gets the next sequence number and is written to the event log
+    in the checkpoint database, so any number of readers can follow it and a client that
+    reconnects with `Last-Event-ID` continues where it left off without re-running the agent.
+    """
+
+    def __init__(self, storage, runnable, configs: List[dict], sessions: int = 1,
+                 on_done: Optional[Callable[[], None]] = None):
+        self.stream_id = uuid.uuid4().hex
+        self.storage = storage
+        self.runnable = runnable
+        self.configs = configs
+        self.sessions = sessions
+        self.on_done = on_done
+        self.events: List[str] = []
+        self.done = False
+        self.readers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+        self._flushed = 0
+        self._flushed_at = 0.0
+        self._cancel_timer = None
+
+    def start(self, producer: AsyncIterator[dict], timeout: float = None) -> "StreamRun":
+        _live[self.stream_id] = self
+        self.task = asyncio.create_task(self._drive(producer, timeout))
+        return self
+
+    def append(self, payload: str) -> None:
+        self.events.append(payload)
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _drive(self, producer: AsyncIterator[dict], timeout: Optional[float]) -> None:
+        SESSIONS_IN_FLIGHT.inc(self.sessions)
+        try:
+            await asyncio.wait_for(self._consume(producer), timeout)
+        except asyncio.TimeoutError:
+            RUNS_STOPPED.labels("deadline").inc()
+            self.append(dumps({"type": "error", "error": f"The request did not finish within {timeout:g}s and was cancelled."}))
+            await self._repair()
+        except asyncio.CancelledError:
+            await self._repair()
+            raise
+        except Exception as e:
+            RUNS_STOPPED.labels("error").inc()
+            logger.exception("Agent run failed")
+            self.append(dumps({"type": "error", "error": str(e) or type(e).__name__}))
+        finally:
+            SESSIONS_IN_FLIGHT.dec(self.sessions)
+            if self.on_done is not None:
+                try:
+                    self.on_done()
+                except Exception:
+                    logger.exception("Completion callback of stream %s failed", self.stream_id)
+            self.append(DONE)
+            self.done = True
+            try:
+                await self._flush()
+            except Exception:
+                logger.exception("Could not store the events of stream %s", self.stream_id)
+            _live.pop(self.stream_id, None)
+
+    async def _consume(self, producer: AsyncIterator[dict]) -> None:
+        loop = asyncio.get_running_loop()
+        async for event in producer:
+            self.append(dumps(event))
+            # Tokens are written in batches, everything else right away
+            if event.get("type") != "token" or loop.time() - self._flushed_at >= EVENT_FLUSH_SECONDS:
+                await self._flush()
+
+    async def _flush(self) -> None:
+        pending = self.events[self._flushed:]
+        if not pending:
+            return
+        start = self._flushed
+        self._flushed = len(self.events)
+        self._flushed_at = asyncio.get_running_loop().time()
+        await self.storage.append_stream_events(
+            self.stream_id, [(start + i + 1, payload) for i, payload in enumerate(pending)],
+        )
+
+    async def _repair(self) -> None:
+        for config in self.configs:
+            try:
+                await repair_thread(self.runnable, config)
+            except Exception:
+                logger.exception("Could not repair thread %s", config["configurable"].get("thread_id"))
+
+    def attach(self) -> None:
+        self.readers += 1
+        if self._cancel_timer is not None:
+            self._cancel_timer.cancel()
+            self._cancel_timer = None
+
+    def detach(self) -> None:
+        """
+        Called when a reader goes away. Once nobody follows the run any more, it is cancelled
+        after the reconnect grace period so it stops spending tokens and tool calls.
+        """
+        self.readers -= 1
+        if self.readers > 0 or self.done:
+            return
+
+        def cancel():
+            self._cancel_timer = None
+            if self.readers == 0 and not self.done:
+                RUNS_STOPPED.labels("disconnect").inc()
+                logger.info("Client of stream %s did not come back, cancelling the agent run", self.stream_id)
+                self.task.cancel()
+
+        if RECONNECT_GRACE_SECONDS > 0:
+            self._cancel_timer = asyncio.get_running_loop().call_later(RECONNECT_GRACE_SECONDS, cancel)
+        else:
+            cancel()
+
+
+def is_live(stream_id: str) -> bool:
+    return stream_id in _live
+
+
+def live_stats() -> dict:
+    """
+    Counts the runs of this process that are still streaming, their readers and the
+    events they hold in memory.
+    """
+    runs = list(_live.values())
+    return {
+        "streams": len(runs),
+        "readers": sum(run.readers for run in runs),
+        "buffered_bytes": sum(len(event) for run in runs for event in run.events),
+    }
+
+
+def start_run(producer: AsyncIterator[dict], storage, runnable, configs: List[dict],
+              timeout: float = None, sessions: int = 1, on_done: Optional[Callable[[], None]] = None) -> StreamRun:
+    """
+    Starts driving `producer` (an async iterator of event dicts) as a StreamRun.
+    It is cancelled after `timeout` seconds, and the threads in `configs` are then repaired.
+    `on_done` is called once the run has ended, however it ended.
+    """
+    return StreamRun(storage, runnable, configs, sessions, on_done).start(producer, timeout)
+
+
+async def follow(stream_id: str, request: Request, storage, after: int = 0) -> AsyncIterator[str]:
+    """
+    Yields the SSE-encoded events of a stream with a seq greater than `after`, live as they
+    are produced, with heartbeats while the run is quiet. Ends with the run or when the
+    client disconnects. Streams that are not live in this process are replayed from the event log.
+    """
+    run = _live.get(stream_id)
+    if run is None:
+        async for event in _replay(stream_id, request, storage, after):
+            yield event
+        return
+
+    loop = asyncio.get_running_loop()
+    next_check = loop.time() + DISCONNECT_POLL_SECONDS
+    last_sent = loop.time()
+    run.attach()
+    try:
+        while True:
+            while after < len(run.events):
+                after += 1
+                yield encode(run.events[after - 1], event_id(stream_id, after))
+                last_sent = loop.time()
+            if run.done:
+                return
+
+            changed = run._changed
+            try:
+                await asyncio.wait_for(changed.wait(), max(next_check - loop.time(), 0))
+            except asyncio.TimeoutError:
+                pass
+
+            now = loop.time()
+            if now >= next_check:
+                next_check = now + DISCONNECT_POLL_SECONDS
+                if await request.is_disconnected():
+                    return
+                if now - last_sent >= HEARTBEAT_SECONDS:
+                    yield HEARTBEAT
+                    last_sent = now
+    finally:
+        run.detach()
+
+
+async def _replay(stream_id: str, request: Request, storage, after: int) -> AsyncIterator[str]:
+    """
+    Replays a stream from the event log. If it is still being written (by another worker
+    process), new events are polled for until the stream ends or goes quiet for too long.
+    """
+    loop = asyncio.get_running_loop()
+    last_event = last_sent = loop.time()
+    while True:
+        for seq, payload in await storage.stream_events(stream_id, after):
+            after = seq
+            last_event = last_sent = loop.time()
+            yield encode(payload, event_id(stream_id, seq))
+            if payload == DONE:
+                return
+        if loop.time() - last_event >= REPLAY_IDLE_TIMEOUT_SECONDS:
+            yield encode(dumps({"type": "error", "error": "The stream is no longer running."}))
+            yield encode(DONE)
+            return
+        if await request.is_disconnected():
+            return
+        if loop.time() - last_sent >= HEARTBEAT_SECONDS:
+            yield HEARTBEAT
+            last_sent = loop.time()
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+async def repair_thread(runnable, config: dict) -> bool:
+    """
+    Makes an interrupted thread resumable. If the run stopped between the model asking for
+    tools and the tool results being saved, every pending tool call gets a cancellation result,
+    since the model API rejects a history with unanswered tool calls.
+    Returns True if the thread was changed.
+    """
+    state = await runnable.aget_state(config)
+    messages = (state.values or {}).get("messages") or []
+    if not messages or not isinstance(messages[-1], AIMessage) or not messages[-1].tool_calls:
+        return False
+    outputs = [ToolMessage(content=CANCELLED_TOOL_OUTPUT, tool_call_id=tc["id"]) for tc in messages[-1].tool_calls]
+    await runnable.aupdate_state(config, {"messages": outputs}, as_node="tools")
+    logger.info("Repaired %d interrupted tool call(s) in thread %s", len(outputs), config["configurable"].get("thread_id"))
+    return True
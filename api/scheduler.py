@@ -0,0 +1,179 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+
+from metrics import LLM_QUEUE_REJECTED, LLM_QUEUE_WAIT
+
+# Priority classes, most urgent first. A user waiting on a /feedback answer is interactive,
+# a fresh /start is standard and the sessions of a /batch are bulk work.
+INTERACTIVE = "interactive"
+STANDARD = "standard"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, STANDARD, BULK)
+
+
+class SchedulerBusy(RuntimeError):
+    """
+    Raised when the queue of a priority class is full. `retry_after` is a hint in seconds.
+    """
+
+    def __init__(self, priority: str, retry_after: int):
+        super().__init__(f"Too many {priority} requests are waiting for the model, retry in {retry_after}s.")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class LLMScheduler:
+    """
+    Admission control for outbound LLM calls.
+    At most `max_concurrency` calls run at once and, when `tokens_per_minute` is set,
+    calls also wait for their estimated tokens in a token bucket refilled at that rate.
+    Waiting calls are served strictly by priority class, then in arrival order, and each
+    class queues at most `max_queued` calls; beyond that `SchedulerBusy` is raised.
+    """
+
+    def __init__(self, max_concurrency: int = 8, tokens_per_minute: int = 0, max_queued: int = 100):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queued = max_queued
+        self.rejected = 0
+
+        self._active = 0
+        self._queue = []
+        self._queued = dict.fromkeys(PRIORITIES, 0)
+        self._order = itertools.count()
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._timer = None
+        # Moving average of how long a call holds its slot, for the Retry-After hint
+        self._service_seconds = 5.0
+
+    def queued(self, priority: str = None) -> int:
+        return self._queued[priority] if priority else sum(self._queued.values())
+
+    def admit(self, priority: str) -> None:
+        """
+        Rejects a new request up front when its priority class has no queue room left.
+        """
+        if self._queued[priority] >= self.max_queued:
+            self.rejected += 1
+            LLM_QUEUE_REJECTED.labels(priority).inc()
+            raise SchedulerBusy(priority, self.retry_after(priority))
+
+    def retry_after(self, priority: str) -> int:
+        ahead = sum(self._queued[p] for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+        return max(1, round(ahead / self.max_concurrency * self._service_seconds))
+
+    @asynccontextmanager
+    async def slot(self, priority: str, tokens: int, on_queued=None):
+        """
+        Holds one LLM call slot for the enclosed block, charging `tokens` to the rate budget.
+        If the call has to wait, `on_queued(position)` is awaited first.
+        """
+        await self._acquire(priority, tokens, on_queued)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._service_seconds = 0.9 * self._service_seconds + 0.1 * (time.monotonic() - started)
+            self._active -= 1
+            self._pump()
+
+    def charge(self, tokens: int) -> None:
+        """
+        Corrects the rate budget once the real token usage of a call is known.
+        `tokens` is the difference to the estimate and may be negative.
+        """
+        if self.tokens_per_minute > 0:
+            self._refill()
+            self._tokens = min(self._tokens - tokens, float(self.tokens_per_minute))
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": dict(self._queued),
+            "rejected": self.rejected,
+            "tokens_available": round(self._tokens) if self.tokens_per_minute > 0 else None,
+        }
+
+    async def _acquire(self, priority: str, tokens: int, on_queued) -> None:
+        if not self._has_waiters() and self._active < self.max_concurrency and self._take(tokens):
+            self._active += 1
+            LLM_QUEUE_WAIT.labels(priority).observe(0)
+            return
+
+        self.admit(priority)
+        entry = (PRIORITIES.index(priority), next(self._order), tokens, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, entry)
+        self._queued[priority] += 1
+        # Starts the refill timer if the call is only waiting for tokens
+        self._pump()
+        started = time.monotonic()
+        try:
+            if on_queued is not None and not entry[3].done():
+                position = sum(1 for e in self._queue if e[:2] <= entry[:2] and not e[3].done())
+                await on_queued(position)
+            await entry[3]
+        except asyncio.CancelledError:
+            if entry[3].done() and not entry[3].cancelled():
+                # The slot was granted just as the caller went away, hand it on
+                self._active -= 1
+                self._pump()
+            else:
+                entry[3].cancel()
+            raise
+        finally:
+            self._queued[priority] -= 1
+        LLM_QUEUE_WAIT.labels(priority).observe(time.monotonic() - started)
+
+    def _has_waiters(self) -> bool:
+        return any(not entry[3].done() for entry in self._queue)
+
+    def _pump(self) -> None:
+        """
+        Grants free slots to the waiting calls in priority order.
+        """
+        while self._queue:
+            _, _, tokens, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            if self._active >= self.max_concurrency:
+                return
+            if not self._take(tokens):
+                self._pump_when_refilled(tokens)
+                return
+            heapq.heappop(self._queue)
+            self._active += 1
+            future.set_result(None)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        rate = self.tokens_per_minute / 60
+        self._tokens = min(float(self.tokens_per_minute), self._tokens + (now - self._refilled_at) * rate)
+        self._refilled_at = now
+
+    def _take(self, tokens: int) -> bool:
+        if self.tokens_per_minute <= 0:
+            return True
+        self._refill()
+        # A call larger than the whole budget only waits for a full bucket
+        needed = min(tokens, self.tokens_per_minute)
+        if self._tokens < needed:
+            return False
+        self._tokens -= needed
+        return True
+
+    def _pump_when_refilled(self, tokens: int) -> None:
+        if self._timer is not None:
+            return
+        missing = min(tokens, self.tokens_per_minute) - self._tokens
+        delay = max(missing / (self.tokens_per_minute / 60), 0.01)
+
+        def wake():
+            self._timer = None
+            self._pump()
+
+        self._timer = asyncio.get_running_loop().call_later(delay, wake)
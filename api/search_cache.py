@@ -0,0 +1,171 @@
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from langchain_core.tools import StructuredTool
+
+
+class SearchFailed(RuntimeError):
+    """
+    The search backend reported an error instead of results. Failures are not cached.
+    """
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a search query so trivially different spellings share one cache entry.
+    """
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.strip(" .?!,;:\"'")
+
+
+class SearchCache:
+    """
+    TTL cache for search results with an in-memory LRU in front of a SQLite table,
+    so cached results survive restarts.
+    """
+    TABLE = "search_cache"
+
+    def __init__(self, db_path: str, ttl_seconds: float = 86400, max_memory_entries: int = 1000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.TABLE} (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at < self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.TABLE} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at >= self.ttl_seconds:
+                self._conn.execute(f"DELETE FROM {self.TABLE} WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._remember(key, value, created_at)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        created_at = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.TABLE} (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, created_at),
+            )
+            self._conn.commit()
+            self._remember(key, value, created_at)
+
+    def purge(self) -> int:
+        """
+        Deletes every expired entry. `get` only drops an expired entry when its key is read
+        again, which most keys never are. Returns the number of deleted rows.
+        """
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            deleted = self._conn.execute(f"DELETE FROM {self.TABLE} WHERE created_at < ?", (cutoff,)).rowcount
+            self._conn.commit()
+            for key in [key for key, (_, created_at) in self._memory.items() if created_at < cutoff]:
+                del self._memory[key]
+        return deleted
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+
+class CachedSearch:
+    """
+    Wraps a search backend with a SearchCache and single-flight deduplication:
+    concurrent lookups of the same normalized query share one backend request.
+
+    `backend` is anything with an async `ainvoke({"query": ...})`, such as TavilySearch
+    or a local fake provider in tests and benchmarks.
+    """
+
+    def __init__(self, backend, cache: SearchCache):
+        self.backend = backend
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self._inflight = {}
+        self._waiters = {}
+
+    async def search(self, query: str) -> str:
+        key = normalize_query(query)
+
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        # Join a request that is already running for the same query. The request runs
+        # in its own task, so one caller going away does not cancel it for the others.
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fetch(key, query))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.get(key) is t and self._inflight.pop(key))
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # Nobody is left waiting for the result, so stop the backend request
+            if self._waiters[key] == 1:
+                task.cancel()
+                # A caller arriving before the cancellation lands starts a fresh request
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    async def _fetch(self, key: str, query: str) -> str:
+        result = await self.backend.ainvoke({"query": query})
+        # Tavily reports failures as {"error": <exception>} rather than raising
+        if isinstance(result, dict) and "error" in result:
+            raise SearchFailed(f"Search failed: {result['error']}")
+        if not isinstance(result, str):
+            result = json.dumps(result, default=str)
+        await asyncio.to_thread(self.cache.set, key, result)
+        return result
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "shared": self.shared, "inflight": len(self._inflight)}
+
+    def as_tool(self, name: str, description: str) -> StructuredTool:
+        async def web_search(query: str) -> str:
+            return await self.search(query)
+
+        return StructuredTool.from_function(coroutine=web_search, name=name, description=description)
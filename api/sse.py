@@ -0,0 +1,49 @@
+import json
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library encoder produces the same events
+    orjson = None
+
+# Sent as the last event of every stream
+DONE = "[DONE]"
+
+# SSE comment line: ignored by clients, but keeps proxies from closing an idle connection
+HEARTBEAT = ": keep-alive\n\n"
+
+
+def dumps(data) -> str:
+    """
+    Serializes an event payload to compact JSON. Values JSON does not know are sent as strings.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=str).decode()
+    return json.dumps(data, default=str, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode(data: str, event_id: Optional[str] = None) -> str:
+    """
+    Formats one SSE event. `data` is the already serialized payload; every line of it
+    becomes its own `data:` field, so newlines can never break the framing.
+    """
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+def event_id(stream_id: str, seq: int) -> str:
+    return f"{stream_id}:{seq}"
+
+
+def parse_event_id(value: Optional[str]) -> tuple[Optional[str], int]:
+    """
+    Splits a `Last-Event-ID` value into (stream_id, seq). A bare number is a seq without stream id.
+    """
+    if not value:
+        return None, 0
+    stream_id, _, seq = value.strip().rpartition(":")
+    try:
+        return stream_id or None, int(seq)
+    except ValueError:
+        return None, 0
@@ -0,0 +1,80 @@
+import re
+from typing import AsyncIterator
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+# Event types sent to the client in "tokens" stream mode
+TOKEN = "token"
+TOOL_START = "tool_start"
+TOOL_END = "tool_end"
+FINAL = "final"
+QUEUED = "queued"
+
+# Only events coming from these graph nodes are forwarded to the client
+LLM_NODE = "llm"
+TOOLS_NODE = "tools"
+
+# Custom events dispatched by the llm node: a response replayed from the response cache,
+# and QUEUED when its model call has to wait for the scheduler
+CACHED_RESPONSE = "cached_response"
+# Custom event dispatched by the tools node for results that bypass the tool callbacks
+# (served from the prefetch, timed out or failed)
+TOOL_RESULT = "tool_result"
+
+
+def _tool_output_text(output) -> str:
+    if isinstance(output, ToolMessage):
+        return str(output.content)
+    return str(output)
+
+
+async def stream_agent_events(runnable, inputs, config, **kwargs) -> AsyncIterator[dict]:
+    """
+    Runs the agent graph and yields typed events as soon as they are produced:
+    - {"type": "token", "content": ...} for every token generated by the LLM
+    - {"type": "tool_start", "name": ..., "input": ...} when a tool call begins
+    - {"type": "tool_end", "name": ..., "output": ...} when a tool call finishes
+    - {"type": "queued", "position": ...} when an LLM call waits for the scheduler
+    - {"type": "final", "content": ...} once, with the last complete AI message of the run
+    Responses served from the LLM response cache are replayed as the same token events.
+    Extra keyword arguments (e.g. `interrupt_after`) are passed on to the graph run.
+    """
+    final_content = ""
+
+    async for event in runnable.astream_events(inputs, config=config, version="v2", **kwargs):
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+
+        if kind == "on_chat_model_stream" and node == LLM_NODE:
+            chunk = event["data"]["chunk"]
+            if chunk.content:
+                yield {"type": TOKEN, "content": chunk.content}
+
+        elif kind == "on_chat_model_end" and node == LLM_NODE:
+            output = event["data"].get("output")
+            if isinstance(output, AIMessage) and output.content and not output.tool_calls:
+                final_content = output.content
+
+        elif kind == "on_custom_event" and event["name"] == CACHED_RESPONSE and node == LLM_NODE:
+            content = event["data"]["content"]
+            for token in re.findall(r"\s*\S+\s*", content):
+                yield {"type": TOKEN, "content": token}
+            if content and not event["data"]["tool_calls"]:
+                final_content = content
+
+        elif kind == "on_custom_event" and event["name"] == QUEUED and node == LLM_NODE:
+            yield {"type": QUEUED, "position": event["data"]["position"]}
+
+        elif kind == "on_custom_event" and event["name"] == TOOL_RESULT and node == TOOLS_NODE:
+            data = event["data"]
+            if not data["started"]:
+                yield {"type": TOOL_START, "name": data["name"], "input": data["input"]}
+            yield {"type": TOOL_END, "name": data["name"], "output": data["output"]}
+
+        elif kind == "on_tool_start" and node == TOOLS_NODE:
+            yield {"type": TOOL_START, "name": event["name"], "input": event["data"].get("input")}
+
+        elif kind == "on_tool_end" and node == TOOLS_NODE:
+            yield {"type": TOOL_END, "name": event["name"], "output": _tool_output_text(event["data"].get("output"))}
+
+    yield {"type": FINAL, "content": final_content}
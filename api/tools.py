@@ -1,40 +1,73 @@
 import os
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
-from langchain_tavily import TavilySearch
+import asyncio
+from typing import Annotated, Optional
+from langchain_core.tools import InjectedToolArg
+from mailer import DEFAULT_SMTP_HOST, MailQueue, build_mail_queue
+from search_cache import CachedSearch, SearchCache
 
-def get_tools():
+def build_search(backend=None) -> CachedSearch:
+    """
+    Returns the cached web search used by the `web_search` tool.
+    The backend defaults to Tavily and can be swapped, e.g. for a local fake provider.
+    """
+    if backend is None:
+        # This uses the Tavily Search API to find information online.
+        # Imported here, the Tavily client is slow to import and not needed with another backend.
+        from langchain_tavily import TavilySearch
+        backend = TavilySearch(max_results=3)
+    cache = SearchCache(
+        os.getenv("SEARCH_CACHE_PATH", "search_cache.sqlite"),
+        ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "86400")),
+        max_memory_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000")),
+    )
+    return CachedSearch(backend, cache)
+
+def get_tools(resume_store, search: CachedSearch = None, mail_queue: MailQueue = None):
     """
     Returns a list of tools that the agent can use.
+    Resumes attached by `send_email` are resolved through `resume_store`,
+    and emails are delivered in the background by `mail_queue`.
     """
     # 1. Web Search Tool
-    # This tool uses the Tavily Search API to find information online.
-    tavily_search = TavilySearch(max_results=3)
-    tavily_search.name = "web_search"
-    tavily_search.description = "A search engine useful for finding information about companies, their mission, and recent news."
+    # Results are cached per normalized query and identical concurrent queries share one request.
+    search = search or build_search()
+    web_search = search.as_tool(
+        name="web_search",
+        description="A search engine useful for finding information about companies, their mission, and recent news.",
+    )
 
     # 2. Email Sending Tool
-    # Note: This is a simplified email tool for this project.
-    # In a real-world scenario, you would use a more robust service like SendGrid or AWS SES.
-    def send_email(recipient_email: str, subject: str, body: str, resume_path: str) -> str:
+    # The tool only builds and queues the message, so the agent turn does not wait on SMTP.
+    # Delivery, connection reuse and retries are handled by the mail queue.
+    mail_queue = mail_queue or build_mail_queue()
+
+    async def send_email(
+        recipient_email: str,
+        subject: str,
+        body: str,
+        resume_id: Annotated[str, InjectedToolArg],
+        resume_name: Annotated[Optional[str], InjectedToolArg] = None,
+        session_id: Annotated[Optional[str], InjectedToolArg] = None,
+    ) -> str:
         """
-        Sends an email with the resume attached.
+        Queues an email with the resume attached for delivery.
         recipient_email: The email address of the recipient.
         subject: The subject of the email.
         body: The body content of the email.
-        resume_path: The file path of the resume to be attached.
         """
+        # resume_id, resume_name and session_id are injected by the agent from the session,
+        # they are hidden from the model's view of the tool.
         try:
             sender_email = os.getenv("SENDER_EMAIL")
             app_password = os.getenv("GMAIL_APP_PASSWORD")
 
-            if not all([sender_email, app_password]):
+            # A password is only optional when pointing at a custom (e.g. local) SMTP server
+            if not sender_email or (not app_password and mail_queue.pool.host == DEFAULT_SMTP_HOST):
                 return "Error: Gmail credentials are not set in the environment variables."
 
             # Create the email message
+            from email.mime.multipart import MIMEMultipart
+            from email.mime.text import MIMEText
             msg = MIMEMultipart()
             msg['From'] = sender_email
             msg['To'] = recipient_email
@@ -42,22 +75,22 @@ def get_tools():
             msg.attach(MIMEText(body, 'plain'))
 
             # Attach the resume
-            if os.path.exists(resume_path):
-                with open(resume_path, "rb") as attachment:
-                    part = MIMEBase('application', 'octet-stream')
-                    part.set_payload(attachment.read())
-                encoders.encode_base64(part)
-                part.add_header('Content-Disposition', f"attachment; filename= {os.path.basename(resume_path)}")
+            resume_path = resume_store.path(resume_id) if resume_id else None
+            if resume_path:
+                attachment_name = resume_name or "resume" + os.path.splitext(resume_path)[1]
+                # The encoded attachment is cached per resume, so it is only read and encoded once
+                part = await asyncio.to_thread(mail_queue.attachments.get, resume_id, resume_path, attachment_name)
                 msg.attach(part)
             else:
                 return "Error: Resume file not found for attachment."
 
-            # Send the email
-            with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-                server.login(sender_email, app_password)
-                server.send_message(msg)
+            # Queue the email for delivery; its status is recorded against the session
+            delivery_id = await mail_queue.enqueue(msg, session_id)
 
-            return f"Email successfully sent to {recipient_email}."
+            return (
+                f"Email queued for delivery to {recipient_email} (delivery id {delivery_id}). "
+                "It has not been delivered yet."
+            )
 
         except Exception as e:
             return f"Error sending email: {e}"
@@ -68,4 +101,4 @@ def get_tools():
     email_tool.name = "send_email"
     email_tool.description = "Use this tool to send an email with a resume attached. Do not use it for anything else."
 
-    return [tavily_search, email_tool]
+    return [web_search, email_tool]
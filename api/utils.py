@@ -1,6 +1,28 @@
-import docx
-from pypdf import PdfReader
+import asyncio
 import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+# pypdf and python-docx are imported where they are used, so importing this module stays
+# cheap; parsing normally happens in the pool processes
+
+# Resume parsing is CPU bound, so it runs in a process pool instead of on the event loop
+RESUME_PARSE_WORKERS = int(os.getenv("RESUME_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# PDFs with more pages than this are split into page ranges parsed in parallel
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+
+_parse_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_parse_executor() -> ProcessPoolExecutor:
+    """
+    Returns the shared process pool used for resume parsing, creating it on first use.
+    """
+    global _parse_executor
+    if _parse_executor is None:
+        _parse_executor = ProcessPoolExecutor(max_workers=RESUME_PARSE_WORKERS)
+    return _parse_executor
+
 
 def read_resume_file(file_path: str) -> str:
     """
@@ -11,18 +33,75 @@ def read_resume_file(file_path: str) -> str:
 
     try:
         if file_path.endswith('.pdf'):
+            from pypdf import PdfReader
             reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() or ""
-            return text
+            return "".join(page.extract_text() or "" for page in reader.pages)
         elif file_path.endswith('.docx'):
+            import docx
             doc = docx.Document(file_path)
-            text = ""
-            for para in doc.paragraphs:
-                text += para.text + "\n"
-            return text
+            return "".join(para.text + "\n" for para in doc.paragraphs)
         else:
             return "Error: Unsupported file format. Please upload a PDF or DOCX file."
     except Exception as e:
         return f"Error reading file: {e}"
+
+
+def count_pdf_pages(file_path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
+
+
+def extract_pdf_pages(file_path: str, start: int, stop: int) -> str:
+    """
+    Extracts the text of pages [start, stop) of a PDF file.
+    """
+    from pypdf import PdfReader
+    reader = PdfReader(file_path)
+    return "".join(reader.pages[i].extract_text() or "" for i in range(start, stop))
+
+
+def shutdown_parse_executor() -> None:
+    global _parse_executor
+    if _parse_executor is not None:
+        _parse_executor.shutdown(cancel_futures=True)
+        _parse_executor = None
+
+
+def load_parsers() -> None:
+    import docx
+    import pypdf
+
+
+async def warm_parse_executor() -> None:
+    """
+    Starts the parse pool processes and loads the parsers in them, so the first upload
+    does not wait for a process to start and import pypdf.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_parse_executor()
+    await asyncio.gather(*(loop.run_in_executor(executor, load_parsers) for _ in range(RESUME_PARSE_WORKERS)))
+
+
+async def aread_resume_file(file_path: str, executor: Optional[ProcessPoolExecutor] = None) -> str:
+    """
+    Async version of `read_resume_file` that parses in a process pool.
+    Large PDFs are fanned out page range by page range across the pool workers.
+    """
+    loop = asyncio.get_running_loop()
+    executor = executor or get_parse_executor()
+
+    if not file_path.endswith('.pdf') or not os.path.exists(file_path):
+        return await loop.run_in_executor(executor, read_resume_file, file_path)
+
+    try:
+        page_count = await loop.run_in_executor(executor, count_pdf_pages, file_path)
+        if page_count <= PDF_PAGES_PER_TASK:
+            return await loop.run_in_executor(executor, read_resume_file, file_path)
+
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(executor, extract_pdf_pages, file_path, start, min(start + PDF_PAGES_PER_TASK, page_count))
+            for start in range(0, page_count, PDF_PAGES_PER_TASK)
+        ))
+        return "".join(parts)
+    except Exception as e:
+        return f"Error reading file: {e}"
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, List
+
+from langchain_core.messages import AIMessage
+
+from streaming import FINAL, LLM_NODE, QUEUED, TOKEN, TOOL_START, TOOLS_NODE, stream_agent_events
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for the number of drafts one request may ask for
+MAX_DRAFT_VARIANTS = int(os.getenv("MAX_DRAFT_VARIANTS", "4"))
+
+# Only these events of the alternative drafts are forwarded; their research is the main run's
+_BRANCH_EVENTS = (TOKEN, QUEUED, FINAL)
+
+
+def variant_thread_id(thread_id: str, index: int) -> str:
+    return f"{thread_id}:variant-{index}"
+
+
+def variant_config(config: dict, index: int) -> dict:
+    """
+    Config for the alternative draft `index` of a thread: a thread of its own, sampled at the
+    variant temperature and never answered from the response cache (see Agent.call_openai).
+    """
+    configurable = config["configurable"]
+    return {"configurable": {
+        **configurable,
+        "thread_id": variant_thread_id(configurable["thread_id"], index),
+        "variant": index,
+    }}
+
+
+async def _draft_branch(runnable, values: dict, config: dict, index: int, queue: asyncio.Queue) -> None:
+    """
+    Forks the research state `values` into the thread of variant `index` and lets the model
+    write one more reply there. The branch stops after that LLM call, so it never runs tools.
+    """
+    branch_config = variant_config(config, index)
+    try:
+        await runnable.checkpointer.adelete_thread(branch_config["configurable"]["thread_id"])
+        await runnable.aupdate_state(branch_config, values, as_node=TOOLS_NODE)
+        async for event in stream_agent_events(runnable, None, branch_config, interrupt_after=[LLM_NODE]):
+            if event["type"] in _BRANCH_EVENTS:
+                await queue.put({**event, "variant": index})
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.exception("Draft variant %d of thread %s failed", index, config["configurable"]["thread_id"])
+        await queue.put({"type": "error", "error": str(e) or type(e).__name__, "variant": index})
+
+
+async def stream_variants(runnable, inputs, config: dict, count: int) -> AsyncIterator[dict]:
+    """
+    Runs the agent and streams `count` alternative drafts of its reply, interleaved and tagged
+    with their `variant` index. Variant 0 is the regular run of the thread. When it starts
+    writing text, the research it has done so far (the checkpointed state before that LLM
+    call) is forked into `count - 1` branch threads that draft the same reply concurrently.
+    If the regular run turns out to call tools after all, the branches are dropped and
+    forked again at its next text turn. Each variant ends with its own final event.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    branches: List[asyncio.Task] = []
+
+    async def fork() -> bool:
+        # The checkpoint before the running LLM call is written asynchronously; wait until it is there
+        state = await runnable.aget_state(config)
+        if LLM_NODE not in state.next:
+            return False
+        branches.extend(
+            asyncio.create_task(_draft_branch(runnable, state.values, config, index, queue))
+            for index in range(1, count)
+        )
+        return True
+
+    async def drop_branches() -> None:
+        for task in branches:
+            task.cancel()
+        await asyncio.gather(*branches, return_exceptions=True)
+        branches.clear()
+
+    async def drive() -> None:
+        try:
+            async for event in stream_agent_events(runnable, inputs, config):
+                if event["type"] == TOKEN and not branches:
+                    await fork()
+                elif event["type"] == TOOL_START and branches:
+                    await drop_branches()
+                await queue.put({**event, "variant": 0})
+            await asyncio.gather(*branches)
+        finally:
+            queue.put_nowait(None)
+
+    driver = asyncio.create_task(drive())
+    try:
+        while (event := await queue.get()) is not None:
+            yield event
+        await driver
+    finally:
+        driver.cancel()
+        for task in branches:
+            task.cancel()
+        await asyncio.gather(driver, *branches, return_exceptions=True)
+
+
+async def select_variant(runnable, config: dict, index: int) -> None:
+    """
+    Commits draft variant `index` to the thread: the chosen draft replaces the thread's last
+    reply, so the conversation continues from it. All variant branches of the thread are deleted.
+    Raises ValueError if there is no such draft.
+    """
+    if index:
+        messages = (await runnable.aget_state(config)).values.get("messages") or []
+        branch = (await runnable.aget_state(variant_config(config, index))).values.get("messages") or []
+        if not messages or not isinstance(messages[-1], AIMessage) or len(branch) < len(messages):
+            raise ValueError(f"There is no draft variant {index} for this session.")
+        draft = branch[-1]
+        if not isinstance(draft, AIMessage) or not draft.content or draft.tool_calls:
+            raise ValueError(f"Draft variant {index} did not produce a draft.")
+        # A message with the id of the last one replaces it (see history.append_messages)
+        chosen = draft.model_copy(update={"id": messages[-1].id})
+        await runnable.aupdate_state(config, {"messages": [chosen]}, as_node=LLM_NODE)
+
+    thread_id = config["configurable"]["thread_id"]
+    for branch_index in range(1, MAX_DRAFT_VARIANTS):
+        await runnable.checkpointer.adelete_thread(variant_thread_id(thread_id, branch_index))
@@ -0,0 +1,188 @@
+import codecs
+import json
+import re
+import time
+from typing import Iterator, NamedTuple, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Sent by the API as the last event of every stream
+DONE = "[DONE]"
+
+_LINE_END = re.compile(r"\r\n|\r|\n")
+
+
+class APIError(Exception):
+    """
+    Raised when the API rejects a request. `retry_after` is set when the server is busy (429).
+    """
+
+    def __init__(self, status: int, detail: str, retry_after: Optional[int] = None):
+        super().__init__(f"{status}: {detail}")
+        self.status = status
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class StreamInterrupted(APIError):
+    """
+    Raised when a stream broke off and could not be resumed.
+    """
+
+    def __init__(self, detail: str):
+        super().__init__(0, detail)
+
+
+class SSEEvent(NamedTuple):
+    id: Optional[str]
+    data: str
+
+
+class SSEParser:
+    """
+    Incremental Server-Sent Events parser. Bytes are fed in as they arrive, in chunks of
+    any size; complete events are returned once their terminating blank line has been read,
+    so events split across reads (or several events in one read) are handled correctly.
+    """
+
+    def __init__(self):
+        self.last_event_id: Optional[str] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Drops a partially read event, e.g. before reading the same stream from a new connection.
+        The id of the last complete event is kept.
+        """
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._data = []
+        self._id = self.last_event_id
+
+    def feed(self, chunk: bytes) -> list[SSEEvent]:
+        self._buffer += self._decoder.decode(chunk)
+        events = []
+        while match := _LINE_END.search(self._buffer):
+            # A trailing "\r" may be the first half of "\r\n"; wait for the next chunk
+            if match.group() == "\r" and match.end() == len(self._buffer):
+                break
+            line = self._buffer[:match.start()]
+            self._buffer = self._buffer[match.end():]
+            event = self._line(line)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _line(self, line: str) -> Optional[SSEEvent]:
+        if not line:
+            if not self._data:
+                return None
+            event = SSEEvent(self._id, "\n".join(self._data))
+            self._data = []
+            self.last_event_id = self._id
+            return event
+        if line.startswith(":"):
+            # Comment, e.g. a heartbeat
+            return None
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            self._data.append(value)
+        elif field == "id" and "\0" not in value:
+            self._id = value
+        return None
+
+
+class AgentClient:
+    """
+    Client for the job application API.
+    Requests share one pooled `requests.Session`, so the connection to the API is reused
+    across steps. Agent replies are streamed in "tokens" mode and yielded as event dicts
+    as soon as they arrive. If the connection drops mid-stream, the client reconnects to
+    `/stream/{stream_id}` with `Last-Event-ID` and continues where it left off.
+    """
+
+    def __init__(self, base_url: str, timeout=(5, 60), max_reconnects: int = 3, pool_size: int = 10):
+        self.base_url = base_url.rstrip("/")
+        # The read timeout only has to outlast the server's heartbeat interval
+        self.timeout = timeout
+        self.max_reconnects = max_reconnects
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def start(self, resume_name: str, resume, resume_type: str, job_description: str,
+              no_cache: bool = False, variants: int = 1) -> Iterator[dict]:
+        """
+        Starts a new application. Yields the agent's events; they carry the new `session_id`.
+        With variants > 1 the first draft is written that many times; events carry a `variant` index.
+        """
+        files = {"resume": (resume_name, resume, resume_type)}
+        data = {"job_description": job_description, "stream_mode": "tokens", "no_cache": str(no_cache).lower(),
+                "variants": str(variants)}
+        return self._stream("POST", "/start", files=files, data=data)
+
+    def feedback(self, session_id: str, feedback: str, recipient_email: str = None,
+                 no_cache: bool = False, variant: int = None, variants: int = 1) -> Iterator[dict]:
+        """
+        Sends feedback (change requests, the recipient, the confirmation) and yields the agent's events.
+        `variant` picks the draft of a multi-draft reply that the feedback applies to.
+        """
+        body = {"session_id": session_id, "feedback": feedback, "stream_mode": "tokens", "no_cache": no_cache,
+                "variants": variants}
+        if variant is not None:
+            body["variant"] = variant
+        if recipient_email:
+            body["recipient_email"] = recipient_email
+        return self._stream("POST", "/feedback", json=body)
+
+    def emails(self, session_id: str) -> list[dict]:
+        """
+        Returns the delivery status ("queued", "sent" or "failed") of the emails the session queued.
+        """
+        with self._open("GET", f"/sessions/{session_id}/emails") as response:
+            return response.json()["emails"]
+
+    def _open(self, method: str, path: str, **kwargs) -> requests.Response:
+        response = self.session.request(method, self.base_url + path, stream=True, timeout=self.timeout, **kwargs)
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", response.reason)
+            except ValueError:
+                detail = response.text or response.reason
+            response.close()
+            retry_after = response.headers.get("Retry-After")
+            raise APIError(response.status_code, str(detail), int(retry_after) if retry_after else None)
+        return response
+
+    def _stream(self, method: str, path: str, **kwargs) -> Iterator[dict]:
+        response = self._open(method, path, **kwargs)
+        stream_id = response.headers.get("X-Stream-ID")
+        parser = SSEParser()
+        reconnects = 0
+        while True:
+            if response is not None:
+                try:
+                    with response:
+                        for chunk in response.iter_content(chunk_size=None):
+                            for event in parser.feed(chunk):
+                                if event.data == DONE:
+                                    return
+                                yield json.loads(event.data)
+                except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                    pass
+
+            # The connection ended before [DONE]: pick the stream up again after the last event
+            if not stream_id or reconnects >= self.max_reconnects:
+                raise StreamInterrupted("The connection to the agent was lost.")
+            reconnects += 1
+            time.sleep(0.5 * reconnects)
+            parser.reset()
+            headers = {"Last-Event-ID": parser.last_event_id} if parser.last_event_id else {}
+            try:
+                response = self._open("GET", f"/stream/{stream_id}", headers=headers)
+            except requests.RequestException:
+                response = None
@@ -1,12 +1,64 @@
+import os
 import streamlit as st
 import requests
-import json
-import time
+
+from api_client import AgentClient, APIError
 
 # --- Configuration ---
-API_URL = "http://127.0.0.1:8000"  # Local API URL
+API_URL = os.getenv("API_URL", "http://127.0.0.1:8000")  # Local API URL
 st.set_page_config(page_title="AI Job Application Assistant", layout="wide")
 
+# Status shown while a tool runs
+TOOL_STATUS = {
+    "web_search": "🔎 Researching the company...",
+    "send_email": "📧 Queueing the email...",
+}
+
+
+@st.cache_resource
+def get_client() -> AgentClient:
+    # One client per server process, so its connection pool is reused across reruns
+    return AgentClient(API_URL)
+
+
+def stream_reply(events, placeholder) -> str:
+    """
+    Renders the agent's events as they arrive: tokens are appended to the placeholder,
+    tool calls and queueing are shown as a status line. Returns the agent's final reply.
+    """
+    text = ""
+    for event in events:
+        if "session_id" in event:
+            st.session_state.session_id = event["session_id"]
+        kind = event.get("type")
+        if "error" in event:
+            raise APIError(event.get("status", 500), event["error"], event.get("retry_after"))
+        if kind == "token":
+            text += event["content"]
+            placeholder.markdown(text + "▌")
+        elif kind == "tool_start":
+            # Tokens before a tool call belong to an intermediate message
+            text = ""
+            placeholder.markdown(TOOL_STATUS.get(event["name"], f"Running `{event['name']}`..."))
+        elif kind == "queued":
+            placeholder.markdown(f"⏳ Waiting for the model (position {event['position']} in the queue)...")
+        elif kind == "final":
+            text = event["content"] or text
+    placeholder.markdown(text)
+    return text
+
+
+def run_agent(events, placeholder):
+    """
+    Streams one agent turn into the placeholder. Returns None if the API could not be reached.
+    """
+    try:
+        return stream_reply(events, placeholder)
+    except (APIError, requests.exceptions.RequestException) as e:
+        placeholder.empty()
+        st.error(f"API Error: {e}")
+        return None
+
 # --- Session State Initialization ---
 # This ensures that variables persist across reruns
 if "session_id" not in st.session_state:
@@ -47,35 +99,11 @@ if st.session_state.agent_state == "START":
 
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
-            full_response = ""
-            
             with st.spinner("Agent is analyzing, researching, and drafting the email..."):
-                files = {'resume': (uploaded_resume.name, uploaded_resume, uploaded_resume.type)}
-                data = {'job_description': job_description}
-                
-                try:
-                    with requests.post(f"{API_URL}/start", files=files, data=data, stream=True) as r:
-                        r.raise_for_status()
-                        for chunk in r.iter_content(chunk_size=None):
-                            if chunk:
-                                try:
-                                    # Process Server-Sent Events (SSE)
-                                    raw_data = chunk.decode('utf-8')
-                                    if raw_data.startswith('data:'):
-                                        json_data = json.loads(raw_data.split('data: ', 1)[1])
-                                        if "content" in json_data:
-                                            full_response += json_data["content"]
-                                            message_placeholder.markdown(full_response + "▌")
-                                        if "session_id" in json_data:
-                                            st.session_state.session_id = json_data["session_id"]
-                                except json.JSONDecodeError:
-                                    pass # Ignore non-JSON chunks
-
-                except requests.exceptions.RequestException as e:
-                    st.error(f"API Error: {e}")
-                    full_response = "Sorry, I couldn't connect to the agent."
-
-            message_placeholder.markdown(full_response)
+                events = get_client().start(uploaded_resume.name, uploaded_resume, uploaded_resume.type, job_description)
+                full_response = run_agent(events, message_placeholder)
+
+        if full_response is not None:
             st.session_state.messages.append({"role": "assistant", "content": full_response})
             st.session_state.email_draft = full_response
             st.session_state.agent_state = "REVIEW"
@@ -99,15 +127,24 @@ elif st.session_state.agent_state == "REVIEW":
     feedback = st.chat_input("Provide feedback or type 'approve'...")
     if feedback:
         st.session_state.messages.append({"role": "user", "content": feedback})
-        # Handle feedback through the API... (This part is simplified for now)
-        # For a full implementation, you would send this to the /feedback endpoint
-        # and update the draft.
         if "approve" in feedback.lower():
             st.session_state.agent_state = "GET_EMAIL"
             st.rerun()
         else:
-            # In a real app, you'd call the /feedback endpoint here
-            st.warning("Change request noted. In this demo, please approve to continue.")
+            with st.chat_message("user"):
+                st.markdown(feedback)
+
+            # The agent redrafts the email; the review step repeats with the new draft
+            with st.chat_message("assistant"):
+                message_placeholder = st.empty()
+                with st.spinner("Agent is redrafting the email..."):
+                    events = get_client().feedback(st.session_state.session_id, feedback)
+                    full_response = run_agent(events, message_placeholder)
+
+            if full_response is not None:
+                st.session_state.messages.append({"role": "assistant", "content": full_response})
+                st.session_state.email_draft = full_response
+                st.rerun()
 
 
 # STATE 3: Getting the recipient's email
@@ -126,29 +163,12 @@ elif st.session_state.agent_state == "GET_EMAIL":
 
             with st.chat_message("assistant"):
                 message_placeholder = st.empty()
-                full_response = ""
                 with st.spinner("Agent is preparing the final confirmation..."):
                     # This call asks the agent for the final confirmation message
-                    try:
-                        response_data = {"session_id": st.session_state.session_id, "feedback": f"The recipient email is {recipient_email}"}
-                        with requests.post(f"{API_URL}/feedback", json=response_data, stream=True) as r:
-                             r.raise_for_status()
-                             for chunk in r.iter_content(chunk_size=None):
-                                if chunk:
-                                    try:
-                                        raw_data = chunk.decode('utf-8')
-                                        if raw_data.startswith('data:'):
-                                            json_data = json.loads(raw_data.split('data: ', 1)[1])
-                                            if "content" in json_data:
-                                                full_response += json_data["content"]
-                                                message_placeholder.markdown(full_response + "▌")
-                                    except json.JSONDecodeError:
-                                        pass
-                    except requests.exceptions.RequestException as e:
-                        st.error(f"API Error: {e}")
-                        full_response = "Sorry, something went wrong."
-                
-                message_placeholder.markdown(full_response)
+                    events = get_client().feedback(st.session_state.session_id, f"The recipient email is {recipient_email}")
+                    full_response = run_agent(events, message_placeholder)
+
+            if full_response is not None:
                 st.session_state.messages.append({"role": "assistant", "content": full_response})
                 st.session_state.agent_state = "CONFIRM"
                 st.rerun()
@@ -165,28 +185,13 @@ elif st.session_state.agent_state == "CONFIRM":
         
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
-            full_response = ""
             with st.spinner("Agent is sending the email..."):
-                 try:
-                    response_data = {"session_id": st.session_state.session_id, "feedback": "Yes, send the email.", "recipient_email": st.session_state.recipient_email}
-                    with requests.post(f"{API_URL}/feedback", json=response_data, stream=True) as r:
-                         r.raise_for_status()
-                         for chunk in r.iter_content(chunk_size=None):
-                            if chunk:
-                                try:
-                                    raw_data = chunk.decode('utf-8')
-                                    if raw_data.startswith('data:'):
-                                        json_data = json.loads(raw_data.split('data: ', 1)[1])
-                                        if "content" in json_data:
-                                            full_response += json_data["content"]
-                                            message_placeholder.markdown(full_response + "▌")
-                                except json.JSONDecodeError:
-                                    pass
-                 except requests.exceptions.RequestException as e:
-                    st.error(f"API Error: {e}")
-                    full_response = "Sorry, the email could not be sent."
-            
-            message_placeholder.markdown(full_response)
+                events = get_client().feedback(
+                    st.session_state.session_id, "Yes, send the email.", st.session_state.recipient_email,
+                )
+                full_response = run_agent(events, message_placeholder)
+
+        if full_response is not None:
             st.session_state.messages.append({"role": "assistant", "content": full_response})
             st.session_state.agent_state = "DONE"
             st.balloons()
@@ -194,7 +199,21 @@ elif st.session_state.agent_state == "CONFIRM":
 
 # STATE 5: Done
 elif st.session_state.agent_state == "DONE":
-    st.success("Application process completed successfully!")
+    # The agent only queues the email, whether it was delivered is checked separately
+    try:
+        emails = get_client().emails(st.session_state.session_id)
+    except (APIError, requests.exceptions.RequestException) as e:
+        emails = []
+        st.warning(f"Could not check the email delivery: {e}")
+    failed = [e for e in emails if e["status"] == "failed"]
+    if failed:
+        st.error(f"The email to {failed[-1]['recipient']} could not be delivered: {failed[-1]['error']}")
+    elif emails and all(e["status"] == "sent" for e in emails):
+        st.success("Application process completed successfully! The email was delivered.")
+    else:
+        st.info("The email is queued for delivery.")
+        if st.button("Check delivery"):
+            st.rerun()
     if st.button("Start New Application"):
         # Reset the state for a new application
         st.session_state.session_id = None